@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+#Load test for satpasslist.py server mode. Start the server first (python satpasslist.py --server 8080) then point this at it.
+#Fires off a bunch of /passes requests from several threads at once and reports the latency percentiles.
+from time import perf_counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import urlopen
+from urllib.parse import urlencode
+import argparse, json
+
+desc = "Load test a satpasslist.py server running on localhost and report request latency percentiles."
+parser = argparse.ArgumentParser(description=desc)
+parser.add_argument("--port", help="Port the server is listening on. Default is 8080.", type=int, default=8080)
+parser.add_argument("-n", "--requests", help="Total number of requests to send. Default is 200.", type=int, default=200)
+parser.add_argument("-c", "--concurrency", help="Number of requests in flight at once. Default is 4.", type=int, default=4)
+parser.add_argument("--lat", help="Latitude to ask for. Default is 34.11843.", type=float, default=34.11843)
+parser.add_argument("--long", help="Longitude to ask for. Default is -118.30041.", type=float, default=-118.30041)
+parser.add_argument("--alt", help="Altitude to ask for (in meters). Default is 345.", type=float, default=345)
+parser.add_argument("-t", "--timeframe", help="Time-frame to ask for (in hours). Default is 24.", type=int, default=24)
+parser.add_argument("--sats", help="Comma separated satellite names to ask for. Default is 'NOAA 15,NOAA 18,NOAA 19'.", default="NOAA 15,NOAA 18,NOAA 19")
+
+def percentile(sortedvalues, pct):
+    #Nearest-rank percentile, good enough for a load test
+    index = max(0, min(len(sortedvalues) - 1, round(pct / 100 * len(sortedvalues)) - 1))
+    return sortedvalues[index]
+
+def timedrequest(url):
+    start = perf_counter()
+    with urlopen(url) as response:
+        body = json.loads(response.read())
+    return perf_counter() - start, len(body.get("passes", []))
+
+def main():
+    args = parser.parse_args()
+    query = urlencode({"lat": args.lat, "long": args.long, "alt": args.alt, "timeframe": args.timeframe, "sats": args.sats})
+    url = f"http://127.0.0.1:{args.port}/passes?{query}"
+    #One request up front so the first timing doesn't include filling the server's pass cache
+    _, passcount = timedrequest(url)
+    print(f"Sending {args.requests} requests ({args.concurrency} at a time) to {url}")
+    print(f"Each response has {passcount} passes.")
+    start = perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(timedrequest, [url] * args.requests))
+    elapsed = perf_counter() - start
+    latencies = sorted(r[0] * 1000 for r in results)
+    print(f"Total time: {elapsed:.2f} seconds ({args.requests / elapsed:.1f} requests/second)")
+    for pct in (50, 90, 95, 99):
+        print(f"p{pct}: {percentile(latencies, pct):.1f} ms")
+    print(f"max: {latencies[-1]:.1f} ms")
+
+if __name__ == "__main__":
+    main()
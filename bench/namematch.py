@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+#Benchmark for satellite name matching. Builds a catalog sized like the full CelesTrak "active" list (thousands of names) and
+#times the old approach (sequence matcher against every name) against the index in satpasslist.SatNameIndex, which only scores
+#the names that could still change the answer. Both have to give the same answer for every lookup, exits with 1 if they don't.
+from time import perf_counter
+import argparse, os, random, sys
+from difflib import SequenceMatcher
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import satpasslist
+
+desc = "Time fuzzy satellite name matching against a large synthetic catalog, linear scan vs the name index."
+parser = argparse.ArgumentParser(description=desc)
+parser.add_argument("--names", help="Number of names in the synthetic catalog. Default is 8000.", type=int, default=8000)
+parser.add_argument("-q", "--queries", help="Number of misspelled lookups to time. Default is 200.", type=int, default=200)
+parser.add_argument("--seed", help="Random seed. Default is 1.", type=int, default=1)
+
+WEATHER = ["NOAA 15", "NOAA 18", "NOAA 19", "NOAA 20 (JPSS-1)", "NOAA 21 (JPSS-2)", "SUOMI NPP", "METOP-B", "METOP-C",
+           "METEOR-M 2", "METEOR-M2 3", "FENGYUN 3D", "GOES 16", "GOES 18", "HIMAWARI-9", "TERRA", "AQUA", "ISS (ZARYA)"]
+
+def makenames(count, rng):
+    names = list(WEATHER)
+    prefixes = ["STARLINK-", "ONEWEB-", "COSMOS ", "IRIDIUM ", "FLOCK 4P-", "LEMUR-2-", "GLOBALSTAR M", "YAOGAN-"]
+    while len(names) < count:
+        names.append(f"{rng.choice(prefixes)}{rng.randint(1, 9999)}")
+    return list(dict.fromkeys(names))[:count]
+
+def misspell(name, rng):
+    #One random edit: drop, swap or change a character, and maybe mess with the case
+    chars = list(name)
+    i = rng.randrange(len(chars))
+    edit = rng.choice(["drop", "swap", "change"])
+    if edit == "drop" and len(chars) > 3: del chars[i]
+    elif edit == "swap" and i < len(chars) - 1: chars[i], chars[i+1] = chars[i+1], chars[i]
+    else: chars[i] = rng.choice("abcdefghijklmnopqrstuvwxyz0123456789- ")
+    typo = "".join(chars)
+    return typo.lower() if rng.random() < 0.5 else typo
+
+def linearclosest(names, nxsatname):
+    #The original SatFinder.findclosestsatname
+    highestmatch = [None, 0]
+    for s in names:
+        possiblematch = SequenceMatcher(None, nxsatname.lower(), s.lower()).ratio()
+        if possiblematch > highestmatch[1]: highestmatch = [s, possiblematch]
+        if possiblematch > satpasslist.SATNAME_MATCH_RATIO:
+            return s
+    return [None, highestmatch[0] if highestmatch[1] > satpasslist.CLOSE_ENUF_RATIO else None]
+
+def main():
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    names = makenames(args.names, rng)
+    queries = [misspell(rng.choice(names), rng) for _ in range(args.queries)]
+
+    start = perf_counter()
+    index = satpasslist.SatNameIndex(names)
+    buildtime = perf_counter() - start
+
+    start = perf_counter()
+    linear = [linearclosest(index.names, q) for q in queries]
+    lineartime = perf_counter() - start
+    start = perf_counter()
+    indexed = [index.findclosest(q) for q in queries]
+    indexedtime = perf_counter() - start
+
+    agree = sum(1 for a, b in zip(linear, indexed) if a == b)
+    print(f"{len(names)} names, {len(queries)} misspelled lookups")
+    print(f"index build:  {buildtime*1000:8.1f} ms")
+    print(f"linear scan:  {lineartime*1000:8.1f} ms total, {lineartime/len(queries)*1000:7.2f} ms per lookup")
+    print(f"name index:   {indexedtime*1000:8.1f} ms total, {indexedtime/len(queries)*1000:7.2f} ms per lookup")
+    print(f"speedup:      {lineartime/indexedtime:8.1f}x, same answer for {agree}/{len(queries)} lookups")
+    if agree < len(queries):
+        for query, a, b in zip(queries, linear, indexed):
+            if a != b:
+                print(f"  '{query}': linear scan {a}, index {b}")
+        exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+#Times the pass search against pyorbital's Orbital.get_next_passes() (what satpasslist.py used to call for every satellite) over
+#the same fixed TLE snapshot and start time as pipeline.py, and checks that both find the same passes. The pass search is run
+#at a few --precision values to show what the looser ones buy. Exits with 1 if any satellite/station pair gets a different
+#number of passes, or an AOS or LOS more than the two tolerances together (precision + 0.001 s) apart, so it works as a check too.
+#Max elevation times can be a few seconds apart on passes that go nearly overhead. That's get_next_passes() stopping short of the
+#peak: at those times its max elevation is lower (by up to a degree or so), the pass search's is never lower by more than a rounding error.
+from time import perf_counter
+import argparse, os, sys
+from datetime import datetime
+import pytz
+
+BENCHFOLDER = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHFOLDER, ".."))
+import satpasslist
+
+SNAPSHOTPATH = os.path.join(BENCHFOLDER, "tle_snapshot.txt")
+STARTTIME = 1792000000
+#What get_next_passes() refines its horizon crossings to (in seconds)
+REFERENCE_TOLERANCE = 0.001
+#The README example location, somewhere near the equator and somewhere close to the pole where polar orbits pass every orbit
+STATIONS = [("Los Angeles", 34.11843, -118.30041, 0.345), ("Equator", 0.5, 32.6, 1.2), ("Svalbard", 78.23, 15.4, 0.5)]
+
+desc = "Compare the satpasslist.py pass search with pyorbital's get_next_passes() for speed and results, exits with 1 if they don't agree."
+parser = argparse.ArgumentParser(description=desc)
+parser.add_argument("--sats", help="Number of satellites from the snapshot to use. Default is 10.", type=int, default=10)
+parser.add_argument("-t", "--timeframe", help="Time-frame to search (in hours). Default is 72.", type=int, default=72)
+parser.add_argument("--precisions", help="Comma separated --precision values to time (in seconds). Default is 0.001,0.1,1.", default="0.001,0.1,1")
+
+def maxdiff(found, reference):
+    #Biggest difference (in seconds) between matching AOS, LOS and max elevation times, or None if the passes don't line up
+    if len(found) != len(reference):
+        return None
+    diffs = [0.0, 0.0, 0.0]
+    for passdata, refdata in zip(found, reference):
+        for i in range(3):
+            diffs[i] = max(diffs[i], abs((passdata[i].replace(tzinfo=None) - refdata[i]).total_seconds()))
+    return diffs
+
+def main():
+    args = parser.parse_args()
+    satpasslist.loadpyorbital()
+    catalog = satpasslist.TLECatalog(SNAPSHOTPATH)
+    entries = list(catalog.entries.values())[:args.sats]
+    satparamslist = [satpasslist.Orbital(entry.name, line1=entry.line1, line2=entry.line2) for entry in entries]
+    starttime_dt = datetime.fromtimestamp(STARTTIME, tz=pytz.utc)
+    print(f"{len(entries)} satellites, {len(STATIONS)} stations, {args.timeframe} hours from {starttime_dt:%Y-%m-%d %H:%M:%S} UTC\n")
+
+    start = perf_counter()
+    reference = [[satparams.get_next_passes(starttime_dt.replace(tzinfo=None), args.timeframe, lon, lat, alt) for satparams in satparamslist]
+                 for _, lat, lon, alt in STATIONS]
+    referencetime = perf_counter() - start
+    npasses = sum(len(passlist) for stationpasses in reference for passlist in stationpasses)
+    print(f"{'get_next_passes() (tol 0.001 s)':<34}{referencetime*1000:9.1f} ms   {npasses} passes")
+
+    failures = 0
+    for precision in [float(p) for p in args.precisions.split(",")]:
+        predictors = [satpasslist.PassPredictor(lon, lat, alt, tol=precision) for _, lat, lon, alt in STATIONS]
+        start = perf_counter()
+        found = satpasslist.findstationpasses(predictors, satparamslist, starttime_dt, args.timeframe)
+        searchtime = perf_counter() - start
+        diffs = [maxdiff(f, r) for stationfound, stationref in zip(found, reference) for f, r in zip(stationfound, stationref)]
+        mismatched = sum(1 for d in diffs if d is None)
+        worst = [max((d[i] for d in diffs if d is not None), default=0.0) for i in range(3)]
+        print(f"{f'pass search (precision {precision:g} s)':<34}{searchtime*1000:9.1f} ms   {referencetime/searchtime:5.1f}x faster, "
+              f"max difference AOS {worst[0]:.4f} s, LOS {worst[1]:.4f} s, max elevation {worst[2]:.4f} s"
+              + (f", {mismatched} satellite/station pairs with a different number of passes" if mismatched > 0 else ""))
+        #get_next_passes() is only exact to 0.001 s itself
+        if mismatched > 0 or max(worst[0], worst[1]) > precision + REFERENCE_TOLERANCE:
+            print(f"  FAILED: the passes don't match get_next_passes() to within {precision + REFERENCE_TOLERANCE:g} s")
+            failures += 1
+    if failures > 0:
+        exit(1)
+
+if __name__ == "__main__":
+    main()
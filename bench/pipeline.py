@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+#Benchmark suite for the pass prediction pipeline. Everything is fixed so runs can be compared against each other: the TLE data
+#comes from tle_snapshot.txt next to this script (100 low earth orbit satellites, epoch mid October 2026), the start time is
+#fixed and so are the ground stations. Each case is a number of satellites, a time-frame and a number of stations, and gets
+#timed stage by stage with the same profiler --profile uses. The propagation call counts don't depend on how fast the machine
+#is, so a change in those points at the algorithm rather than the hardware. The times are the fastest of --repeat runs (5 by
+#default), a single run is too noisy to compare against a threshold.
+#   python bench/pipeline.py --save before.json
+#   (make changes)
+#   python bench/pipeline.py --compare before.json
+#The full matrix takes a while (100 satellites over 30 days for 50 stations is most of it), use --sats/--hours/--stations to pick.
+from time import perf_counter
+import argparse, contextlib, io, json, os, subprocess, sys
+from datetime import datetime
+
+BENCHFOLDER = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHFOLDER, ".."))
+import satpasslist
+
+SNAPSHOTPATH = os.path.join(BENCHFOLDER, "tle_snapshot.txt")
+#2026-10-14 17:46:40 UTC, a couple of days before the snapshot epoch
+STARTTIME = 1792000000
+#Cases that only take a few milliseconds swing by more than --threshold from scheduling alone, so a case has to be at least this
+#much slower (in seconds) as well to count
+SLOWER_FLOOR = 0.02
+
+desc = "Time the pass prediction pipeline over a fixed TLE snapshot for a matrix of satellite counts, time-frames and station counts."
+parser = argparse.ArgumentParser(description=desc)
+parser.add_argument("--sats", help="Comma separated satellite counts to run. Default is 1,10,100.", default="1,10,100")
+parser.add_argument("--hours", help="Comma separated time-frames to run (in hours). Default is 24,168,720.", default="24,168,720")
+parser.add_argument("--stations", help="Comma separated station counts to run. Default is 1,50.", default="1,50")
+parser.add_argument("-r", "--repeat", help="Run each case this many times and keep the fastest, so one slow run doesn't count as a regression. Default is 5.", type=int, default=5)
+parser.add_argument("-w", "--workers", help="Number of processes to predict with, same as satpasslist.py --workers. Default is 1.", type=int, default=1)
+parser.add_argument("--save", help="Write the results to this JSON file.")
+parser.add_argument("--compare", help="Compare against results saved with --save and exit with 1 if anything got slower or makes more propagation calls.")
+parser.add_argument("--threshold", help="How much slower (in percent) a case has to get to count as a regression, on top of being 20ms slower. Default is 20.", type=float, default=20)
+
+def makestations(count):
+    #The README example location first, then the rest spread over the globe by a golden angle spiral
+    stations = [(34.11843, -118.30041, 0.345)]
+    for i in range(1, count):
+        lat = -60 + 120 * i / max(1, count - 1)
+        lon = (i * 137.508) % 360 - 180
+        stations.append((round(lat, 4), round(lon, 4), 0.1 * (i % 10)))
+    return stations[:count]
+
+def timeimport():
+    #The pyorbital import only happens once per process, so it gets timed in a fresh interpreter
+    code = "import sys; sys.path.insert(0, sys.argv[1]); import satpasslist; satpasslist.loadpyorbital()"
+    start = perf_counter()
+    subprocess.run([sys.executable, "-c", code, os.path.join(BENCHFOLDER, "..")], check=True)
+    return perf_counter() - start
+
+def runcase(satnames, hours, stations, workers):
+    catalog = satpasslist.tlecatalog
+    #Orbital objects get memoized by the catalog, start each run from scratch so the lookup gets timed every time
+    catalog.orbitals = {}
+    satpasslist.profiler = profiler = satpasslist.Profiler()
+    satfinds = [satpasslist.SatFinder(lon, lat, alt, 0) for lat, lon, alt in stations]
+    with profiler.stage("satellite lookup"):
+        satparamslist = [satfinds[0].getsatparams(satname) for satname in satnames]
+    starttime_dt = satfinds[0].getstarttime(STARTTIME)
+    allstationpasses = satpasslist.predictpasses(satfinds, satparamslist, starttime_dt, hours, workers)
+    npasses = 0
+    with profiler.stage("filter and print"), contextlib.redirect_stdout(io.StringIO()):
+        for satfind, allpasses in zip(satfinds, allstationpasses):
+            passes = [passdata for passlist in satfind.reportpasses(allpasses, satnames, hours, None) if passlist is not None for passdata in passlist]
+            passes.sort()
+            satfind.printpasses(passes)
+            npasses += len(passes)
+    satpasslist.profiler = None
+    total = perf_counter() - profiler.started
+    return {"seconds": total, "stages": profiler.stages, "calls": profiler.calls, "passes": npasses}
+
+def main():
+    args = parser.parse_args()
+    cases = [(int(n), int(h), int(s)) for n in args.sats.split(",") for h in args.hours.split(",") for s in args.stations.split(",")]
+
+    importtime = timeimport()
+    satpasslist.loadpyorbital()
+    start = perf_counter()
+    satpasslist.tlecatalog = satpasslist.TLECatalog(SNAPSHOTPATH)
+    catalogtime = perf_counter() - start
+    names = [entry.name for entry in satpasslist.tlecatalog.entries.values()]
+    if max(n for n, _, _ in cases) > len(names):
+        print(f"The snapshot only has {len(names)} satellites.")
+        exit(1)
+    print(f"Python {sys.version.split()[0]}, start time {datetime.utcfromtimestamp(STARTTIME)} UTC, {args.workers} worker(s)")
+    print(f"interpreter + pyorbital import: {importtime*1000:8.1f} ms")
+    print(f"TLE catalog load ({len(names)} sats):  {catalogtime*1000:8.1f} ms\n")
+
+    #First run in a process pays for numpy/scipy warming up, keep that out of the first case
+    runcase(names[:1], 1, makestations(1), 1)
+
+    header = f"{'sats':>4} {'hours':>5} {'stns':>4} {'passes':>7} {'lookup':>9} {'propagate':>10} {'refine':>10} {'geometry':>9} {'print':>8} {'total':>10} {'positions':>10} {'looks':>9}"
+    print(header)
+    #Repeats go round the whole matrix rather than running each case back to back, so a stretch where the machine is busy
+    #doesn't land on every run of the same case
+    runs = {case: [] for case in cases}
+    for _ in range(max(1, args.repeat)):
+        for nsats, hours, nstations in cases:
+            runs[(nsats, hours, nstations)].append(runcase(names[:nsats], hours, makestations(nstations), args.workers))
+    results = {}
+    for (nsats, hours, nstations), caseruns in runs.items():
+        result = min(caseruns, key=lambda run: run["seconds"])
+        results[f"{nsats}x{hours}hx{nstations}"] = result
+        ms = lambda stage: result["stages"].get(stage, 0.0) * 1000
+        steps = lambda name: result["calls"].get(name, [0, 0])[1]
+        #With --workers the search runs in the process pool, so the time shows up as propagate
+        print(f"{nsats:>4} {hours:>5} {nstations:>4} {result['passes']:>7} {ms('satellite lookup'):>7.1f}ms {ms('propagation') + ms('process pool'):>8.1f}ms "
+              f"{ms('pass refinement'):>8.1f}ms {ms('pass geometry'):>7.1f}ms {ms('filter and print'):>6.1f}ms {result['seconds']*1000:>8.1f}ms "
+              f"{steps('get_position'):>10} {steps('get_observer_look'):>9}", flush=True)
+
+    if args.save is not None:
+        with open(args.save, "w") as savefile:
+            json.dump({"importtime": importtime, "catalogtime": catalogtime, "cases": results}, savefile, indent=1)
+        print(f"\nSaved results to {args.save}")
+    if args.compare is not None:
+        with open(args.compare, "r") as comparefile:
+            baseline = json.load(comparefile)["cases"]
+        regressions = 0
+        print(f"\nCompared to {args.compare}:")
+        for case, result in results.items():
+            if case not in baseline:
+                continue
+            change = (result["seconds"] / baseline[case]["seconds"] - 1) * 100
+            notes = []
+            if change > args.threshold and result["seconds"] - baseline[case]["seconds"] > SLOWER_FLOOR:
+                notes.append("SLOWER")
+            if result["calls"] != baseline[case]["calls"]:
+                #Every call has a fixed overhead that's bigger than the cost of a few hundred extra time steps, so it's the number
+                #of calls that counts as a regression
+                oldcalls, oldsteps = (sum(counts[i] for counts in baseline[case]["calls"].values()) for i in (0, 1))
+                newcalls, newsteps = (sum(counts[i] for counts in result["calls"].values()) for i in (0, 1))
+                notes.append(f"propagation calls {oldcalls} -> {newcalls}, time steps {oldsteps} -> {newsteps}")
+                if newcalls > oldcalls:
+                    notes.append("MORE PROPAGATION")
+            if result["passes"] != baseline[case]["passes"]:
+                notes.append(f"passes {baseline[case]['passes']} -> {result['passes']}")
+            if "SLOWER" in notes or "MORE PROPAGATION" in notes:
+                regressions += 1
+            print(f"  {case:<14} {baseline[case]['seconds']*1000:10.1f}ms -> {result['seconds']*1000:10.1f}ms {change:+7.1f}%  {', '.join(notes)}")
+        if regressions > 0:
+            print(f"{regressions} case(s) regressed.")
+            exit(1)
+
+if __name__ == "__main__":
+    main()
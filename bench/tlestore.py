@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+#Checks the TLE source handling (satpasslist.TLEStore) against a local HTTP stand-in for CelesTrak, no internet needed. The
+#stand-in serves two overlapping groups made from tle_snapshot.txt, with ETags like the real thing, and the store goes through
+#a first download, a conditional re-download (304s), one group changing, a group being dropped from the list of sources, a
+#source with a corrupted TLE in it and a source serving junk. Everything happens in a temporary directory. Exits with 1 if
+#anything doesn't behave.
+import argparse, hashlib, os, sys, tempfile, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BENCHFOLDER = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHFOLDER, ".."))
+import satpasslist
+
+SNAPSHOTPATH = os.path.join(BENCHFOLDER, "tle_snapshot.txt")
+
+desc = "Check TLE downloading and merging against a local HTTP stand-in, exits with 1 if anything is off."
+parser = argparse.ArgumentParser(description=desc)
+parser.add_argument("-v", "--verbose", help="Print every request the stand-in gets.", action="store_true")
+
+class StandIn(BaseHTTPRequestHandler):
+    #Serves whatever is in the files dict, answers If-None-Match with a 304 like CelesTrak does
+    files = {}
+    requests = []
+    verbose = False
+
+    def do_GET(self):
+        data = self.files.get(self.path)
+        if data is None:
+            self.send_response(500)
+            self.end_headers()
+            self.requests.append((self.path, 500))
+            return
+        etag = '"' + hashlib.md5(data).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            self.requests.append((self.path, 304))
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(data)
+        self.requests.append((self.path, 200))
+
+    def log_message(self, format, *args):
+        if self.verbose:
+            super().log_message(format, *args)
+
+def withchecksum(line):
+    total = sum(int(c) if c.isdigit() else (1 if c == "-" else 0) for c in line[:68])
+    return line[:68] + str(total % 10)
+
+def newerepoch(entry, days):
+    #Same satellite with its epoch moved forward, the checksum has to be redone or parsetle() throws it out
+    epoch = float(entry.line1[20:32]) + days
+    return satpasslist.TLEEntry(entry.name, withchecksum(entry.line1[:20] + f"{epoch:012.8f}" + entry.line1[32:]), entry.line2)
+
+def tletext(entries):
+    return "".join(f"{entry.name}\n{entry.line1}\n{entry.line2}\n" for entry in entries).encode()
+
+def main():
+    args = parser.parse_args()
+    StandIn.verbose = args.verbose
+    snapshot = list(satpasslist.TLECatalog(SNAPSHOTPATH).entries.values())
+    #Two groups sharing 20 satellites, group b has the newer copy of those
+    groupa = snapshot[:60]
+    groupb = [newerepoch(entry, 0.5) for entry in snapshot[40:60]] + snapshot[60:]
+    StandIn.files = {"/a.txt": tletext(groupa), "/b.txt": tletext(groupb), "/junk.txt": b"<html>Service unavailable</html>"}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = lambda path: f"http://127.0.0.1:{server.server_address[1]}{path}"
+    failures = 0
+
+    def check(description, ok):
+        nonlocal failures
+        print(f"{'ok    ' if ok else 'FAILED'} {description}")
+        if not ok:
+            failures += 1
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        storedir = os.path.join(tempdir, "tlesources")
+        mergedpath = os.path.join(tempdir, "weather.txt")
+        store = lambda sources: satpasslist.TLEStore([url(s) for s in sources], storedir, mergedpath)
+        merged = lambda: {entry.norad: entry for entry in satpasslist.TLECatalog(mergedpath).entries.values()}
+
+        results = store(["/a.txt", "/b.txt"]).update()
+        check("first download gets both sources", list(results.values()) == ["updated", "updated"])
+        catalog = merged()
+        check("merged file has every satellite once", len(catalog) == 100)
+        check("overlapping satellites keep the newest epoch", all(catalog[entry.norad].line1 == entry.line1 for entry in groupb[:20]))
+
+        StandIn.requests.clear()
+        before = open(mergedpath).read()
+        results = store(["/a.txt", "/b.txt"]).update()
+        check("second download is conditional (304 for both)", sorted(StandIn.requests) == [("/a.txt", 304), ("/b.txt", 304)])
+        check("unchanged sources report unchanged", list(results.values()) == ["unchanged", "unchanged"])
+        check("merged file is left alone", open(mergedpath).read() == before)
+
+        changed = newerepoch(groupa[0], 1)
+        StandIn.files["/a.txt"] = tletext([changed] + groupa[1:])
+        results = store(["/a.txt", "/b.txt"]).update()
+        check("only the changed source gets downloaded again", results == {url("/a.txt"): "updated", url("/b.txt"): "unchanged"})
+        check("merged file picks up the change", merged()[changed.norad].line1 == changed.line1)
+
+        results = store(["/a.txt"]).update()
+        catalog = merged()
+        check("dropping a source with nothing else new still reports unchanged", list(results.values()) == ["unchanged"])
+        check("dropping a source removes its satellites from the merged file", len(catalog) == 60)
+        check("overlapping satellites fall back to the remaining source", all(catalog[entry.norad].line1 == entry.line1 for entry in groupa[1:]))
+
+        #One digit off in a line of the last satellite, its checksum doesn't add up any more
+        corrupted = groupa[-1].line2[:30] + str((int(groupa[-1].line2[30]) + 1) % 10) + groupa[-1].line2[31:]
+        StandIn.files["/corrupt.txt"] = tletext(groupa[:-1]) + f"{groupa[-1].name}\n{groupa[-1].line1}\n{corrupted}\n".encode()
+        results = store(["/corrupt.txt"]).update()
+        catalog = merged()
+        check("a TLE with a bad checksum gets left out of the merge", results[url("/corrupt.txt")] == "updated" and len(catalog) == 59 and groupa[-1].norad not in catalog)
+
+        results = store(["/a.txt", "/junk.txt", "/missing.txt"]).update()
+        check("a source serving something that isn't TLE data is rejected", results[url("/junk.txt")] == "no TLE data in the response")
+        check("a source that errors reports the error", "500" in results[url("/missing.txt")])
+        check("failed sources leave the merged file alone", len(merged()) == 60)
+
+        StandIn.files["/a.txt"] = b"<html>Service unavailable</html>"
+        results = store(["/a.txt"]).update()
+        check("a source going bad keeps its last good copy", results[url("/a.txt")] != "updated" and len(merged()) == 60)
+    server.shutdown()
+    if failures > 0:
+        print(f"{failures} check(s) failed.")
+        exit(1)
+
+if __name__ == "__main__":
+    main()
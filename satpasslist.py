@@ -1,12 +1,19 @@
 #!/usr/bin/env python3
-from time import time
+from time import time, perf_counter
 from datetime import datetime, timedelta
-from urllib.request import urlretrieve
+from urllib.request import urlopen, Request
+from urllib.error import HTTPError
 import argparse
-import os, os.path, pytz, warnings
+import os, os.path, re, sys, csv, bisect, importlib.util, pytz, warnings, hashlib, json, math, asyncio, threading, urllib.parse, signal, heapq, itertools
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from difflib import SequenceMatcher
+from collections import Counter
+from contextlib import contextmanager, nullcontext, redirect_stdout
 from distutils.util import strtobool
+#pyorbital (and numpy with it) take a while to import so they get loaded later by loadpyorbital() only when we need them
 Orbital = None
+np = None
+astronomy = None
 
 #If the sequence matcher thinks the input is over SATNAME_MATCH_RATIO it will assume they are the same
 SATNAME_MATCH_RATIO = 0.90
@@ -17,98 +24,1068 @@ CLOSE_ENUF_RATIO = 0.75
 RUNFOLDER = os.path.dirname(__file__)
 CONFPATH = os.path.join(RUNFOLDER, "satpasslist.conf")
 TLEFILEPATH = os.path.join(RUNFOLDER, "weather.txt")
-TLEURL = "https://celestrak.org/NORAD/elements/gp.php?GROUP=weather&FORMAT=tle"
+#TLE sources are CelesTrak group names (filled into TLEGROUPURL) or full URLs. Each one is downloaded into TLESOURCESDIR and
+#they all get merged into TLEFILEPATH.
+TLEGROUPURL = "https://celestrak.org/NORAD/elements/gp.php?GROUP={}&FORMAT=tle"
+TLESOURCESDIR = os.path.join(RUNFOLDER, "tlesources")
+#How many sources get downloaded at once, and how long (in seconds) to wait on any one of them
+TLE_DOWNLOAD_WORKERS = 8
+TLE_DOWNLOAD_TIMEOUT = 30
+PASSCACHEPATH = os.path.join(RUNFOLDER, "passcache.json")
+#How often (in seconds) server mode checks if the TLE data needs to be refreshed, and how many observer locations it keeps warm
+SERVER_TLE_CHECK_INTERVAL = 60 * 60
+SERVER_MAX_OBSERVERS = 64
+#How often (in seconds) server mode writes the pass cache back to disk
+SERVER_CACHE_SAVE_INTERVAL = 60
+#Streaming mode computes passes this many hours at a time, and only when the previous chunk has been used up
+STREAM_CHUNK_HOURS = 12
+#Default precision of the predicted pass times (in seconds), see --precision
+PASS_PRECISION = 0.001
+#The pass search checks where each satellite is this many times per orbit to rule out stretches where no pass is possible, with
+#this much slack (in radians) on the visibility check for the earth not being a perfect sphere
+PASSSEARCH_STEPS_PER_ORBIT = 24
+PASSSEARCH_MARGIN = math.radians(1)
+SIDEREAL_DAY_MINUTES = 1436.0682
+#WGS84 equatorial radius (km) and earth's gravitational parameter (km^3/s^2)
+EARTH_RADIUS = 6378.137
+EARTH_MU = 398600.4418
+#Time step (in minutes) either side of a point used to work out which way the elevation is heading when looking for the culmination
+CULMINATION_STEP = 0.5 / 60
+#Output formats for --format. Everything but text has one row per pass with these columns (plus the station name first), times
+#are unix timestamps. npy and parquet are binary column formats and parquet needs pyarrow.
+EXPORT_FORMATS = ["text", "ndjson", "csv", "npy", "parquet"]
+PASS_FIELDS = ("satname", "aos", "los", "maxeltime", "maxelevation", "azimuth", "longitude", "eastwest", "heading")
+#Seconds between the azimuth/elevation samples of a pass's sky track, see --track
+TRACK_STEP = 1
+#When new TLE data moves passes we already predicted, the ones that moved by more than this many seconds get reported, see --shiftlimit
+PASS_SHIFT_LIMIT = 10
+#Once the pass cache holds more passes than this (entries without any count as one), the least recently used entries get thrown out
+PASSCACHE_MAX_PASSES = 100000
+#Cached predictions get extended in whole steps of this many seconds, so rerunning a query a few minutes later (its window
+#having slid on a bit) is answered from the cache instead of predicting a sliver at the end and rewriting the file for it
+PASSCACHE_EXTEND_STEP = 3600
 
 
 #Suppress warnings in the pyorbital module about timezone representations for numpy datetime object
 warnings.filterwarnings('ignore')
 
+#Set to a Profiler by --profile, everything else leaves it as None and the profiling hooks do nothing
+profiler = None
+
+class Profiler:
+    #Collects wall time per pipeline stage and how many times (and for how many time steps) the orbit math got run. Stages can
+    #be nested, time spent in an inner stage only counts towards the inner one so all the stages add up to the total.
+    def __init__(self):
+        self.started = perf_counter()
+        self.stages = {}
+        self.calls = {}
+        self.stack = []
+
+    @contextmanager
+    def stage(self, name):
+        start = perf_counter()
+        self.stack.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = perf_counter() - start
+            innertime = self.stack.pop()
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed - innertime
+            if len(self.stack) > 0:
+                self.stack[-1] += elapsed
+
+    def count(self, name, steps, calls=1):
+        counts = self.calls.setdefault(name, [0, 0])
+        counts[0] += calls
+        counts[1] += steps
+
+    def addcalls(self, calls):
+        #For counts that came back from worker processes
+        for name, (ncalls, steps) in calls.items():
+            self.count(name, steps, ncalls)
+
+    def report(self):
+        total = perf_counter() - self.started
+        print("\nProfile (wall time per stage):")
+        for name, seconds in sorted(self.stages.items(), key=lambda item: -item[1]):
+            print(f"  {name:<22}{seconds*1000:10.1f} ms {seconds/total*100:5.1f}%")
+        other = total - sum(self.stages.values())
+        print(f"  {'other':<22}{other*1000:10.1f} ms {other/total*100:5.1f}%")
+        print(f"  {'total':<22}{total*1000:10.1f} ms")
+        print("Propagation calls:")
+        if len(self.calls) == 0:
+            print("  none")
+        for name, (ncalls, steps) in sorted(self.calls.items()):
+            print(f"  {name:<22}{ncalls:10} calls {steps:12} time steps")
+
+def profilestage(name):
+    return nullcontext() if profiler is None else profiler.stage(name)
+
+def countpropagation(name, steps):
+    if profiler is not None:
+        profiler.count(name, steps)
+
+#Loaded TLE catalog, shared by everything that needs TLE data so weather.txt is only parsed once per run. See gettlecatalog().
+tlecatalog = None
+
+class TLEEntry:
+    __slots__ = ("name", "norad", "line1", "line2", "epoch", "tlehash", "period")
+
+    def __init__(self, name, line1, line2):
+        self.name = name
+        self.line1 = line1
+        self.line2 = line2
+        self.norad = line1[2:7].strip()
+        #Short fingerprint of the element lines, anything computed from this TLE is only good as long as this doesn't change
+        self.tlehash = hashlib.sha1((line1 + line2).encode()).hexdigest()[:16]
+        #Orbital period in minutes from the mean motion (revs per day)
+        self.period = 1440 / float(line2[52:63])
+        #Epoch is a 2 digit year followed by the fractional day of the year, starting at day 1
+        year = int(line1[18:20])
+        year += 2000 if year < 57 else 1900
+        self.epoch = datetime(year, 1, 1, tzinfo=pytz.utc) + timedelta(days=float(line1[20:32]) - 1)
+
+class SatNameIndex:
+    #Prebuilt index for resolving satellite names, so fuzzy matching against a big catalog (thousands of names) doesn't have to
+    #run the sequence matcher against every single name. It holds:
+    # - aliases: normalized names (case, spaces and punctuation don't matter) plus the bits in brackets, e.g. "JPSS-1" for "NOAA 20 (JPSS-1)"
+    # - charcounts: which names contain each character and how many times, to bound how well every name could possibly match
+    def __init__(self, names):
+        self.names = sorted(names)
+        self.lowernames = [name.lower() for name in self.names]
+        self.aliases = {}
+        self.charcounts = {}
+        for i, name in enumerate(self.names):
+            for alias in [name] + re.findall(r"\(([^)]*)\)", name) + [re.sub(r"\s*\([^)]*\)", "", name)]:
+                #Don't let an alias steal a name another satellite really has
+                self.aliases.setdefault(self.normalize(alias).replace(" ", ""), name)
+            for char, count in Counter(self.lowernames[i]).items():
+                self.charcounts.setdefault(char, []).append((i, count))
+
+    def normalize(self, name):
+        return " ".join(re.sub(r"[^a-z0-9]+", " ", name.lower()).split())
+
+    def lookup(self, name):
+        #Exact match ignoring case, spacing and punctuation, or None
+        return self.aliases.get(self.normalize(name).replace(" ", ""))
+
+    def getbounds(self, lowered):
+        #Upper bound on the sequence matcher ratio against every name, the same one difflib's quick_ratio() uses: two names can't
+        #match more characters than they have in common
+        shared = [0] * len(self.names)
+        for char, count in Counter(lowered).items():
+            for i, namecount in self.charcounts.get(char, []):
+                shared[i] += min(count, namecount)
+        return [2.0 * matches / (len(lowered) + len(name)) for matches, name in zip(shared, self.lowernames)]
+
+    def findclosest(self, nxsatname):
+        #Same answers as running the sequence matcher over every name in order, but it only scores the names whose bound says they
+        #could still change the answer. Returns the name if the match is over SATNAME_MATCH_RATIO, otherwise [None, closest name
+        #or None if nothing was over CLOSE_ENUF_RATIO].
+        lowered = nxsatname.lower()
+        bounds = self.getbounds(lowered)
+        ratios = {}
+        #Going through the names in order the first one over SATNAME_MATCH_RATIO wins, and only names with a high enough bound can be it
+        for i, bound in enumerate(bounds):
+            if bound > SATNAME_MATCH_RATIO:
+                ratios[i] = SequenceMatcher(None, lowered, self.lowernames[i]).ratio()
+                if ratios[i] > SATNAME_MATCH_RATIO:
+                    return self.names[i]
+        #Otherwise it's the best match (the first one in order if there's a tie), so work down from the names that could score
+        #highest until none of the rest could even tie with the best so far
+        best = None
+        for i in sorted((i for i, bound in enumerate(bounds) if bound > CLOSE_ENUF_RATIO), key=lambda i: (-bounds[i], i)):
+            if best is not None and bounds[i] < ratios[best]:
+                break
+            if i not in ratios:
+                ratios[i] = SequenceMatcher(None, lowered, self.lowernames[i]).ratio()
+            if best is None or ratios[i] > ratios[best] or (ratios[i] == ratios[best] and i < best):
+                best = i
+        #If we didn't get a good solid match then just return the closest thing along with None so we know its not a good match
+        return [None, self.names[best] if best is not None and ratios[best] > CLOSE_ENUF_RATIO else None]
+
+def checksumok(line):
+    #TLE line checksum, same as pyorbital checks: the digits add up, minus signs count as 1, and the last digit is that mod 10
+    if len(line) < 69 or not line[68].isdigit():
+        return False
+    return sum(int(c) if c.isdigit() else (1 if c == "-" else 0) for c in line[:68]) % 10 == int(line[68])
+
+def parsetle(tlelines):
+    #Turns the lines of a TLE file (2 line sets with or without the name line, 3LE files put a "0 " in front of the name) into TLEEntrys.
+    #Sets with a bad checksum or fields that don't parse (a corrupted or cut off download) get skipped, pyorbital would refuse them anyway.
+    lines = [line.strip() for line in tlelines if len(line.strip()) > 0]
+    entries = []
+    name = None
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if line.startswith("1 ") and i+1 < len(lines) and lines[i+1].startswith("2 "):
+            if checksumok(line) and checksumok(lines[i+1]):
+                try:
+                    entries.append(TLEEntry(name if name is not None else line[2:7].strip(), line, lines[i+1]))
+                except (ValueError, ZeroDivisionError):
+                    pass
+            name = None
+            i += 2
+            continue
+        name = line[2:] if line.startswith("0 ") else line
+        i += 1
+    return entries
+
+class TLECatalog:
+    #Parses the whole TLE file once and indexes it by satellite name and NORAD ID. Orbital objects are built straight
+    #from the stored TLE lines and kept around, so no satellite gets its TLE parsed twice in a run.
+    def __init__(self, tlepath=TLEFILEPATH):
+        self.tlepath = tlepath
+        self.entries = {}
+        self.noradids = {}
+        self.orbitals = {}
+        self.nameindex = None
+        self.mtime = None
+        self.load()
+
+    def load(self):
+        self.entries = {}
+        self.noradids = {}
+        self.orbitals = {}
+        self.mtime = os.stat(self.tlepath).st_mtime
+        with open(self.tlepath, "r") as tlefile:
+            for entry in parsetle(tlefile):
+                self.entries[entry.name.upper()] = entry
+                self.noradids[entry.norad] = entry
+        self.nameindex = SatNameIndex(entry.name for entry in self.entries.values())
+
+    def isstale(self):
+        return not os.access(self.tlepath, os.F_OK) or os.stat(self.tlepath).st_mtime != self.mtime
+
+    def getnames(self):
+        return sorted(entry.name for entry in self.entries.values())
+
+    def getentry(self, satname):
+        #Same lookup order pyorbital uses: the name header first, then the NORAD ID. Raises KeyError like Orbital() does.
+        satname = satname.strip().upper()
+        if satname in self.entries:
+            return self.entries[satname]
+        if satname.isdigit() and satname.zfill(5) in self.noradids:
+            return self.noradids[satname.zfill(5)]
+        #Same name written a bit differently (NOAA-15, noaa15) or one of the names in brackets
+        alias = self.nameindex.lookup(satname)
+        if alias is not None:
+            return self.entries[alias.upper()]
+        #pyorbital also knows a few platform names that differ from the TLE name header (e.g. NOAA 20 vs NOAA 20 (JPSS-1))
+        from pyorbital.tlefile import SATELLITES
+        if SATELLITES.get(satname) in self.noradids:
+            return self.noradids[SATELLITES[satname]]
+        raise KeyError(f"Found no TLE entry for '{satname}'")
+
+    def getorbital(self, satname):
+        entry = self.getentry(satname)
+        if entry.name not in self.orbitals:
+            self.orbitals[entry.name] = Orbital(entry.name, line1=entry.line1, line2=entry.line2)
+        return self.orbitals[entry.name]
+
+class TLEStore:
+    #Keeps a local copy of every configured TLE source and merges them into the one TLE file the rest of the program reads.
+    #Downloads run concurrently and are conditional (ETag / Last-Modified from the last download), so a source that hasn't
+    #changed costs a 304 and nothing else. The same satellite shows up in several CelesTrak groups, so the merge keys on the
+    #NORAD ID and keeps whichever copy has the newest epoch. The list of sources the merged file was built from is kept too, so
+    #dropping a source rebuilds the merged file without that source's satellites even if all the others are unchanged.
+    def __init__(self, sources, storedir=TLESOURCESDIR, mergedpath=TLEFILEPATH):
+        self.sources = list(dict.fromkeys(sources))
+        self.storedir = storedir
+        self.mergedpath = mergedpath
+        self.metapath = os.path.join(storedir, "sources.json")
+        self.mergedsourcespath = os.path.join(storedir, "merged.json")
+        self.meta = {}
+        if os.access(self.metapath, os.F_OK):
+            try:
+                with open(self.metapath, "r") as metafile:
+                    self.meta = json.load(metafile)
+            except (OSError, ValueError):
+                self.meta = {}
+
+    def geturl(self, source):
+        return source if "://" in source else TLEGROUPURL.format(urllib.parse.quote(source))
+
+    def getpath(self, source):
+        #Readable file name for the source plus a bit of hash so two URLs can't end up in the same file
+        readable = re.sub(r"[^A-Za-z0-9]+", "_", source.split("://")[-1])[-40:].strip("_")
+        return os.path.join(self.storedir, f"{readable}-{hashlib.sha1(source.encode()).hexdigest()[:8]}.txt")
+
+    def fetch(self, source):
+        #Returns "updated", "unchanged" or the error message. A failed download leaves the last good copy in place.
+        path = self.getpath(source)
+        meta = self.meta.get(source, {})
+        headers = {}
+        if os.access(path, os.F_OK):
+            if meta.get("etag"): headers["If-None-Match"] = meta["etag"]
+            if meta.get("lastmodified"): headers["If-Modified-Since"] = meta["lastmodified"]
+        try:
+            with urlopen(Request(self.geturl(source), headers=headers), timeout=TLE_DOWNLOAD_TIMEOUT) as response:
+                data = response.read()
+                newmeta = {"etag": response.headers.get("ETag"), "lastmodified": response.headers.get("Last-Modified")}
+        except HTTPError as e:
+            if e.code == 304:
+                return "unchanged"
+            return str(e)
+        except Exception as e:
+            return str(e)
+        #Don't trust an error page or an empty reply as TLE data
+        if len(parsetle(data.decode(errors="replace").splitlines())) == 0:
+            return "no TLE data in the response"
+        with open(path + ".tmp", "wb") as sourcefile:
+            sourcefile.write(data)
+        os.replace(path + ".tmp", path)
+        self.meta[source] = newmeta
+        return "updated"
+
+    def update(self):
+        #Fetch every source at once, then rebuild the merged file if anything changed or it was built from other sources. Returns {source: result}.
+        os.makedirs(self.storedir, exist_ok=True)
+        with ThreadPoolExecutor(max_workers=min(TLE_DOWNLOAD_WORKERS, max(1, len(self.sources)))) as pool:
+            results = dict(zip(self.sources, pool.map(self.fetch, self.sources)))
+        with open(self.metapath + ".tmp", "w") as metafile:
+            json.dump(self.meta, metafile)
+        os.replace(self.metapath + ".tmp", self.metapath)
+        if "updated" in results.values() or not os.access(self.mergedpath, os.F_OK) or self.getmergedsources() != self.sources:
+            self.merge()
+        elif "unchanged" in results.values():
+            #Nothing new, but we did just check so the merged file counts as fresh again
+            os.utime(self.mergedpath)
+        return results
+
+    def getmergedsources(self):
+        #The sources the merged file was last built from, or None if we don't know
+        try:
+            with open(self.mergedsourcespath, "r") as mergedsourcesfile:
+                return json.load(mergedsourcesfile)
+        except (OSError, ValueError):
+            return None
+
+    def merge(self):
+        merged = {}
+        for source in self.sources:
+            path = self.getpath(source)
+            if not os.access(path, os.F_OK):
+                continue
+            with open(path, "r", errors="replace") as sourcefile:
+                for entry in parsetle(sourcefile):
+                    if entry.norad not in merged or entry.epoch > merged[entry.norad].epoch:
+                        merged[entry.norad] = entry
+        if len(merged) == 0:
+            return
+        text = "".join(f"{entry.name}\n{entry.line1}\n{entry.line2}\n" for entry in merged.values())
+        #Leave the file alone if nothing actually changed, everything reloads when its mtime moves
+        unchanged = False
+        if os.access(self.mergedpath, os.F_OK):
+            with open(self.mergedpath, "r", errors="replace") as mergedfile:
+                unchanged = mergedfile.read() == text
+        if unchanged:
+            os.utime(self.mergedpath)
+        else:
+            with open(self.mergedpath + ".tmp", "w") as mergedfile:
+                mergedfile.write(text)
+            os.replace(self.mergedpath + ".tmp", self.mergedpath)
+        with open(self.mergedsourcespath, "w") as mergedsourcesfile:
+            json.dump(self.sources, mergedsourcesfile)
+
+def difftlecatalogs(oldcatalog, newcatalog):
+    #Compares two TLE catalogs satellite by satellite (matched up by NORAD ID). A satellite changed if its element lines did,
+    #which also covers a new epoch. Returns lists of TLEEntrys: "added", "removed" (the old entries), "unchanged", "changed"
+    #as (old, new) pairs, and "older" for the changed ones whose new epoch is older than the one we had.
+    diff = {"added": [], "removed": [], "changed": [], "unchanged": [], "older": []}
+    for norad, entry in newcatalog.noradids.items():
+        oldentry = oldcatalog.noradids.get(norad)
+        if oldentry is None:
+            diff["added"].append(entry)
+        elif oldentry.tlehash == entry.tlehash:
+            diff["unchanged"].append(entry)
+        else:
+            diff["changed"].append((oldentry, entry))
+            if entry.epoch < oldentry.epoch:
+                diff["older"].append(entry)
+    diff["removed"] = [entry for norad, entry in oldcatalog.noradids.items() if norad not in newcatalog.noradids]
+    return diff
+
+def gettlecatalog():
+    #Only reparse the TLE file if it changed on disk since we last loaded it (e.g. updatetle() grabbed a new one)
+    global tlecatalog
+    if tlecatalog is None or tlecatalog.isstale():
+        with profilestage("TLE catalog load"):
+            tlecatalog = TLECatalog()
+    return tlecatalog
+
+class PassRecord:
+    #Everything we need to know about a single pass, worked out once when the pass is found so filtering and printing
+    #don't have to go back to the satellite's orbit. Sorts chronologically by AOS.
+    __slots__ = ("satname", "aos", "los", "maxeltime", "maxelevation", "azimuth", "longitude", "eastwest", "heading", "track")
+
+    def __init__(self, satname, aos, los, maxeltime, maxelevation, azimuth, longitude, eastwest, heading, track=None):
+        self.satname = satname
+        self.aos = aos
+        self.los = los
+        self.maxeltime = maxeltime
+        self.maxelevation = maxelevation #Degrees
+        self.azimuth = azimuth #Degrees, at max elevation
+        self.longitude = longitude #Sub-satellite longitude at max elevation
+        self.eastwest = eastwest #Side of the antenna the pass is on, "E" or "W"
+        self.heading = heading #"North" or "South"
+        self.track = track #Sky track from PassPredictor.maketracks(), (samples x 2) float32 azimuth and elevation, or None
+
+    def __lt__(self, other):
+        return (self.aos, self.los) < (other.aos, other.los)
+
+    def getrow(self):
+        #Values in PASS_FIELDS order with the times as unix timestamps
+        return (self.satname, self.aos.timestamp(), self.los.timestamp(), self.maxeltime.timestamp(), self.maxelevation,
+                self.azimuth, self.longitude, self.eastwest, self.heading)
+
+class PassCache:
+    #On-disk cache of predicted passes so repeated runs for the same station don't recompute passes we already know about.
+    #Entries are keyed by satellite, TLE fingerprint, observer location and horizon. Each entry remembers which stretches of time
+    #it covers; a stretch being covered means we know every pass with an AOS inside it. Times are stored as unix timestamps.
+    #Anything before the start of a prediction gets pruned, and past maxpasses the least recently used entries go, which keeps
+    #far future windows and one-off locations (every new lat/long in server mode) from piling up.
+    def __init__(self, cachepath=PASSCACHEPATH, maxpasses=PASSCACHE_MAX_PASSES, autosave=True):
+        self.cachepath = cachepath
+        self.maxpasses = maxpasses
+        #With autosave off the owner has to call save() itself, server mode does that so it isn't rewriting the file every request
+        self.autosave = autosave
+        self.entries = {}
+        self.changed = False
+        self.load()
+
+    def load(self):
+        if not os.access(self.cachepath, os.F_OK):
+            return
+        try:
+            with open(self.cachepath, "r") as cachefile:
+                self.entries = json.load(cachefile)
+        except (OSError, ValueError):
+            #A broken cache just means we have to recompute everything
+            self.entries = {}
+
+    def save(self):
+        if self.changed is False:
+            return
+        self.evict()
+        try:
+            with open(self.cachepath + ".tmp", "w") as cachefile:
+                json.dump(self.entries, cachefile)
+            os.replace(self.cachepath + ".tmp", self.cachepath)
+        except OSError as e:
+            print(f"Couldn't save the pass cache to {self.cachepath}. Reason: \n {str(e)}")
+        self.changed = False
+
+    def evict(self):
+        #Drop the least recently used entries until we're back under the size limit. lastused gets bumped in memory on every
+        #lookup but only written out along with everything else, so a run that only reads the cache doesn't rewrite it.
+        size = lambda entry: max(1, len(entry["passes"]))
+        total = sum(size(entry) for entry in self.entries.values())
+        for key in sorted(self.entries, key=lambda k: self.entries[k].get("lastused", 0)):
+            if total <= self.maxpasses:
+                break
+            total -= size(self.entries[key])
+            del self.entries[key]
+
+    def prune(self, before):
+        #Throws out the passes starting before the unix timestamp before, along with the coverage up to it. Entries that don't
+        #cover anything after it any more are dropped completely, which is what keeps the cache from growing run after run.
+        for key in list(self.entries):
+            entry = self.entries[key]
+            if len(entry["covered"]) > 0 and entry["covered"][0][0] >= before:
+                continue
+            #Clipping the coverage alone isn't worth rewriting the file for, the next save picks it up
+            entry["covered"] = [[max(covstart, before), covend] for covstart, covend in entry["covered"] if covend > before]
+            passcount = len(entry["passes"])
+            entry["passes"] = [p for p in entry["passes"] if p[0] >= before]
+            if len(entry["covered"]) == 0:
+                del self.entries[key]
+                self.changed = True
+            elif len(entry["passes"]) < passcount:
+                self.changed = True
+
+    def getkey(self, tleentry, lon, lat, alt, horizon, precision=PASS_PRECISION):
+        key = f"{tleentry.name}|{tleentry.tlehash}|{lat:.6f}|{lon:.6f}|{alt:.4f}|{horizon}|{precision}"
+        if key not in self.entries:
+            #New TLE for this satellite means everything we had for its old TLE is out of date
+            for oldkey in [k for k, entry in self.entries.items() if entry["satname"] == tleentry.name and entry["tlehash"] != tleentry.tlehash]:
+                del self.entries[oldkey]
+            self.entries[key] = {"satname": tleentry.name, "tlehash": tleentry.tlehash, "epoch": tleentry.epoch.timestamp(),
+                                 "observer": [lon, lat, alt, horizon, precision], "covered": [], "passes": []}
+            self.changed = True
+        self.entries[key]["lastused"] = time()
+        return key
+
+    def getgaps(self, key, starttime_dt, endtime_dt):
+        #Returns a list of (start, end) datetimes inside the window that the cache doesn't cover yet
+        gaps = []
+        gapstart = starttime_dt.timestamp()
+        end = endtime_dt.timestamp()
+        for covstart, covend in self.entries[key]["covered"]:
+            if covend <= gapstart:
+                continue
+            if covstart >= end:
+                break
+            if covstart > gapstart:
+                gaps.append((gapstart, covstart))
+            gapstart = max(gapstart, covend)
+        if gapstart < end:
+            gaps.append((gapstart, end))
+        return [(datetime.fromtimestamp(a, tz=pytz.utc), datetime.fromtimestamp(b, tz=pytz.utc)) for a, b in gaps]
+
+    def addpasses(self, key, starttime_dt, endtime_dt, records):
+        #records must be every pass with an AOS between starttime_dt and endtime_dt
+        entry = self.entries[key]
+        entry["passes"] += [[r.aos.timestamp(), r.los.timestamp(), r.maxeltime.timestamp(), r.maxelevation, r.azimuth, r.longitude, r.eastwest, r.heading] for r in records]
+        entry["passes"].sort()
+        #Merge the new stretch into the covered list, joining up anything that overlaps or touches
+        covered = sorted(entry["covered"] + [[starttime_dt.timestamp(), endtime_dt.timestamp()]])
+        entry["covered"] = [covered[0]]
+        for covstart, covend in covered[1:]:
+            if covstart <= entry["covered"][-1][1]:
+                entry["covered"][-1][1] = max(entry["covered"][-1][1], covend)
+            else:
+                entry["covered"].append([covstart, covend])
+        self.changed = True
+
+    def getpasses(self, key, starttime_dt, endtime_dt):
+        #All cached passes that fit completely inside the window
+        entry = self.entries[key]
+        start = starttime_dt.timestamp()
+        end = endtime_dt.timestamp()
+        fromts = lambda ts: datetime.fromtimestamp(ts, tz=pytz.utc)
+        return [PassRecord(entry["satname"], fromts(p[0]), fromts(p[1]), fromts(p[2]), *p[3:]) for p in entry["passes"] if start <= p[0] and p[1] <= end]
+
+def loadpyorbital():
+    global Orbital, np, astronomy
+    if Orbital is not None:
+        return
+    import numpy as np
+    from pyorbital.orbital import Orbital
+    from pyorbital import astronomy
+
+class PassPredictor:
+    #Batched replacement for calling Orbital.get_next_passes() one satellite at a time. One PassPredictor looks after a single
+    #ground station; findstationpasses() runs a whole set of them together. Every satellite is checked on one shared
+    #minute-by-minute time grid (only where a pass is possible, see sampleelevations()), and only the horizon crossings and
+    #the culminations get refined, to within tol seconds.
+    def __init__(self, lon, lat, alt, horizon=0, tol=PASS_PRECISION):
+        self.lon = lon
+        self.lat = lat
+        self.alt = alt
+        self.horizon = horizon
+        self.tol = tol #Precision of the pass times in seconds
+
+    def gettimegrid(self, starttime_dt, time_limit):
+        #numpy datetimes have no timezone so everything on the grid is naive UTC
+        start = np.datetime64(starttime_dt.astimezone(pytz.utc).replace(tzinfo=None), "us")
+        return start + np.arange(int(round(time_limit * 60))) * np.timedelta64(60, "s")
+
+    def makerecords(self, satparams, passlist):
+        #Works out the pass geometry for every pass of one satellite in a single batched call. We need the look angle at max elevation
+        #and one minute after it (to tell which way the satellite is heading), plus the sub-satellite longitude at max elevation.
+        if len(passlist) == 0:
+            return []
+        maxeltimes = np.array([p[2].astimezone(pytz.utc).replace(tzinfo=None) for p in passlist], dtype="datetime64[us]")
+        looktimes = np.concatenate((maxeltimes, maxeltimes + np.timedelta64(60, "s")))
+        countpropagation("get_observer_look", len(looktimes))
+        countpropagation("get_lonlatalt", len(maxeltimes))
+        azimuths, elevations = satparams.get_observer_look(looktimes, self.lon, self.lat, self.alt)
+        longitudes = satparams.get_lonlatalt(maxeltimes)[0]
+        records = []
+        for i, passdata in enumerate(passlist):
+            maxazimuth = float(azimuths[i])
+            #Longitude gets rounded to a whole degree before deciding the side, same as what gets printed
+            eastwest = "W" if round(float(longitudes[i])) < self.lon else "E"
+            heading = getheading(maxazimuth, azimuths[i + len(passlist)])
+            records.append(PassRecord(satparams.satellite_name, passdata[0], passdata[1], passdata[2], float(elevations[i]), maxazimuth, float(longitudes[i]), eastwest, heading))
+        return records
+
+    def maketracks(self, satparams, records, step=TRACK_STEP):
+        #Adds the sky track to every pass of one satellite: azimuth and elevation every step seconds from AOS up to LOS, as a
+        #(samples x 2) float32 array. All the passes go through a single get_observer_look call over one time array.
+        #The heading stays the one makerecords() worked out at exactly a minute after maxeltime. The track samples fall on whole
+        #steps from AOS, so a heading taken from them flips now and then when that look is right on north or south.
+        if len(records) == 0:
+            return
+        counts = np.array([int((r.los - r.aos).total_seconds() // step) + 1 for r in records])
+        aostimes = np.array([r.aos.astimezone(pytz.utc).replace(tzinfo=None) for r in records], dtype="datetime64[us]")
+        firstsample = np.repeat(np.cumsum(counts) - counts, counts)
+        offsets = ((np.arange(counts.sum()) - firstsample) * step * 1e6).astype("timedelta64[us]")
+        countpropagation("get_observer_look", len(offsets))
+        azimuths, elevations = satparams.get_observer_look(np.repeat(aostimes, counts) + offsets, self.lon, self.lat, self.alt)
+        tracks = np.column_stack((azimuths, elevations)).astype(np.float32)
+        for record, track in zip(records, np.split(tracks, np.cumsum(counts)[:-1])):
+            record.track = track
+
+def getheading(maxazimuth, laterazimuth):
+    #Find the direction. Only way I could think of is to look at the change in azimuth angle and if its going down or up
+    #One minute ahead in time should be enough to tell for sure what direction we are going, using max elevation as reference
+    di = 1 if maxazimuth > laterazimuth else 0
+    #More complicated than I thought, I also have to know what side of the circle I'm on. If we're on the other side its the opposite
+    if maxazimuth < 180:
+        di ^= 1
+    return ["North", "South"][di]
+
+def getframe(lon, lat, alt, times):
+    #The parts of the look angle math that only depend on where the stations are and the time. lon/lat/alt broadcast against times,
+    #so station columns against a time row give (stations x times) arrays and matching 1D arrays give one value per station/time pair.
+    (opos_x, opos_y, opos_z), _ = astronomy.observer_position(times, lon, lat, alt)
+    theta = (astronomy.gmst(times) + np.deg2rad(lon)) % (2 * np.pi)
+    opos = np.array(np.broadcast_arrays(opos_x, opos_y, opos_z))
+    return opos, np.sin(np.deg2rad(lat)), np.cos(np.deg2rad(lat)), np.sin(theta), np.cos(theta)
+
+def getobserverframe(predictors, times):
+    #Frame for every station over the whole time grid, shared by every satellite. Everything comes out as (stations x times) arrays.
+    lon = np.array([[p.lon] for p in predictors], dtype=float)
+    lat = np.array([[p.lat] for p in predictors], dtype=float)
+    alt = np.array([[p.alt] for p in predictors], dtype=float)
+    return getframe(lon, lat, alt, times)
+
+def getelevations(satposition, frame):
+    #satposition is a (3, ...) array of ECI positions in km that broadcasts against the frame, returns the elevations in degrees
+    opos, sin_lat, cos_lat, sin_theta, cos_theta = frame
+    rx, ry, rz = satposition - opos
+    top_z = cos_lat * cos_theta * rx + cos_lat * sin_theta * ry + sin_lat * rz
+    rg = np.sqrt(rx * rx + ry * ry + rz * rz)
+    return np.rad2deg(np.arcsin(np.clip(top_z / rg, -1, 1)))
+
+def sampleelevations(predictors, satparams, times, frame):
+    #Elevations (minus the horizon) of one satellite from every station over the minute grid, as a (stations x times) array. Most of
+    #the time a LEO satellite is nowhere near a station's horizon, so the satellite is first propagated on a coarse grid, a few dozen
+    #steps per orbit. Between two coarse steps the angle between the satellite and the station (seen from the earth's center) can't
+    #change faster than the satellite's angular rate plus the earth's rotation, so if it stays too big for the satellite to clear the
+    #horizon anywhere in between, that whole stretch is skipped. Skipped minutes come back as -180, they're below the horizon for sure.
+    line2 = satparams.tle.line2
+    period = 1440 / float(line2[52:63])
+    eccentricity = float("0." + line2[26:33])
+    #Fastest the satellite can move across the sky (at perigee) plus the station moving with the earth, in radians per minute
+    maxrate = 2 * np.pi / period * (1 + eccentricity) ** 2 / (1 - eccentricity ** 2) ** 1.5 + 2 * np.pi / SIDEREAL_DAY_MINUTES
+    step = max(1, int(period / PASSSEARCH_STEPS_PER_ORBIT))
+    coarse = np.arange(0, len(times), step)
+    if coarse[-1] != len(times) - 1:
+        coarse = np.append(coarse, len(times) - 1)
+    countpropagation("get_position", len(coarse))
+    satposition = satparams.get_position(times[coarse], normalize=False)[0]
+    opos = frame[0][:, :, coarse]
+    satdist = np.sqrt(np.sum(satposition ** 2, axis=0))
+    stationdist = np.sqrt(np.sum(opos ** 2, axis=0))
+    centralangle = np.arccos(np.clip(np.sum(satposition[:, None, :] * opos, axis=0) / (satdist * stationdist), -1, 1))
+    #Biggest central angle the satellite can be at and still be at the horizon elevation (or at 0 for negative horizons)
+    horizon = np.deg2rad(np.array([[min(p.horizon, 0)] for p in predictors], dtype=float))
+    maxangle = np.arccos(np.clip(stationdist * np.cos(horizon) / satdist, -1, 1)) - horizon + PASSSEARCH_MARGIN
+    #Smallest the central angle could get between each pair of coarse steps
+    closest = (centralangle[:, :-1] + centralangle[:, 1:] - maxrate * np.diff(coarse)) / 2
+    possible = np.any(closest <= np.maximum(maxangle[:, :-1], maxangle[:, 1:]), axis=0)
+    #Every minute of any stretch where some station could see the satellite gets sampled, for all the stations
+    edges = np.zeros(len(times) + 1, dtype=int)
+    np.add.at(edges, coarse[:-1][possible], 1)
+    np.add.at(edges, coarse[1:][possible] + 1, -1)
+    sampled = np.flatnonzero(np.cumsum(edges[:-1]) > 0)
+    horizons = np.array([[p.horizon] for p in predictors], dtype=float)
+    elevations = np.full((len(predictors), len(times)), -180.0)
+    if len(sampled) > 0:
+        countpropagation("get_position", len(sampled))
+        satposition = satparams.get_position(times[sampled], normalize=False)[0]
+        sampledframe = tuple(a[..., sampled] if a.shape[-1] == len(times) else a for a in frame)
+        elevations[:, sampled] = getelevations(satposition[:, None, :], sampledframe) - horizons
+    return elevations
+
+def findroots(evaluate, lo, hi, flo, fhi, tol):
+    #Bracketed root finding for a whole batch of brackets at once, each step is one evaluate(minutes, indexes) call covering every
+    #bracket still wider than tol. Each step checks a pair of points 0.4 * tol either side of a guess, so as soon as a guess is good
+    #enough the bracket closes down under tol (a full tol/2 either side could leave a bracket a rounding error too wide forever).
+    #The first guess is the secant through the bracket ends, after that it's a Newton step using the slope between the last pair.
+    #If a bracket hasn't at least halved for two steps in a row it gets bisected instead. flo and fhi have to have opposite signs.
+    lo, hi, flo, fhi = (np.array(v, dtype=float) for v in (lo, hi, flo, fhi))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        guesses = hi - fhi * (hi - lo) / (fhi - flo)
+    stalled = np.zeros(len(lo), dtype=int)
+    active = np.flatnonzero(hi - lo > tol)
+    while len(active) > 0:
+        a, b, fa, fb = lo[active], hi[active], flo[active], fhi[active]
+        guess = guesses[active]
+        guess = np.where(~np.isfinite(guess) | (guess <= a) | (guess >= b) | (stalled[active] >= 2), (a + b) / 2, guess)
+        x1 = np.clip(guess - 0.4 * tol, a, b)
+        x2 = np.clip(guess + 0.4 * tol, a, b)
+        f1, f2 = np.split(evaluate(np.concatenate((x1, x2)), np.concatenate((active, active))), 2)
+        #Keep whichever of [a, x1], [x1, x2] or [x2, b] still has the sign change in it
+        inleft = np.sign(f1) != np.sign(fa)
+        inmiddle = ~inleft & (np.sign(f2) != np.sign(fa))
+        lo[active] = np.where(inleft, a, np.where(inmiddle, x1, x2))
+        flo[active] = np.where(inleft, fa, np.where(inmiddle, f1, f2))
+        hi[active] = np.where(inleft, x1, np.where(inmiddle, x2, b))
+        fhi[active] = np.where(inleft, f1, np.where(inmiddle, f2, fb))
+        stalled[active] = np.where(hi[active] - lo[active] > (b - a) / 2, stalled[active] + 1, 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            guesses[active] = (x1 + x2) / 2 - (f1 + f2) / 2 * (x2 - x1) / (f2 - f1)
+        active = active[hi[active] - lo[active] > tol]
+    return (lo + hi) / 2
+
+def findmaxima(evaluate, lo, hi, tol):
+    #Highest point inside each bracket, found as the root of the elevation rate (from a central difference) with findroots().
+    #If the elevation is only falling (or only rising) over a bracket its highest point is at that end.
+    def slope(minutes, indexes):
+        ahead, behind = np.split(evaluate(np.concatenate((minutes + CULMINATION_STEP, minutes - CULMINATION_STEP)), np.concatenate((indexes, indexes))), 2)
+        return ahead - behind
+    indexes = np.arange(len(lo))
+    slopelo, slopehi = np.split(slope(np.concatenate((lo, hi)), np.concatenate((indexes, indexes))), 2)
+    maxima = np.where(slopelo <= 0, lo, hi)
+    peaked = np.flatnonzero((slopelo > 0) & (slopehi < 0))
+    if len(peaked) > 0:
+        maxima[peaked] = findroots(lambda m, i: slope(m, peaked[i]), lo[peaked], hi[peaked], slopelo[peaked], slopehi[peaked], tol)
+    return maxima
+
+def refinepasses(predictors, satparams, starttime_dt, elevations):
+    #Takes the sampled elevations (minus the horizon) of one satellite from every station and returns [station] lists of the same
+    #(AOS, LOS, max elevation time) tuples that get_next_passes() gives us. All the horizon crossings get refined together and then
+    #all the culminations, so each step of the search is one batched propagation no matter how many passes there are.
+    tol = min(p.tol for p in predictors) / 60.0
+    lon = np.array([p.lon for p in predictors], dtype=float)
+    lat = np.array([p.lat for p in predictors], dtype=float)
+    alt = np.array([p.alt for p in predictors], dtype=float)
+    horizons = np.array([p.horizon for p in predictors], dtype=float)
+    start = np.datetime64(starttime_dt.astimezone(pytz.utc).replace(tzinfo=None), "us")
+    allpasses = [[] for _ in predictors]
+    #Every sign change is either a rise or a set somewhere inside that minute, in order of station and then time
+    stations, guesses = np.nonzero(np.diff(np.sign(elevations), axis=1))
+    if len(guesses) == 0:
+        return allpasses
+
+    def elevation(minutes, brackets, bracketstations):
+        times = start + np.round(minutes * 60e6).astype(np.int64).astype("timedelta64[us]")
+        countpropagation("get_position", len(times))
+        satposition = satparams.get_position(times, normalize=False)[0]
+        s = bracketstations[brackets]
+        return getelevations(satposition, getframe(lon[s], lat[s], alt[s], times)) - horizons[s]
+
+    lo = guesses.astype(float)
+    horizonmins = findroots(lambda m, b: elevation(m, b, stations), lo, lo + 1, elevations[stations, guesses], elevations[stations, guesses + 1], tol)
+    passes = []
+    risemins = {}
+    for station, guess, mins in zip(stations, guesses, horizonmins):
+        if elevations[station, guess] < 0:
+            risemins[station] = mins
+            continue
+        #Passes already in progress at the start of the window don't count, get_next_passes() skips them too
+        if station not in risemins:
+            continue
+        rise = risemins.pop(station)
+        #Start the max elevation search around the highest sample of the pass
+        int_start = max(0, int(np.floor(rise)))
+        int_end = min(elevations.shape[1], int(np.ceil(mins) + 1))
+        middle = int_start + int(np.argmax(elevations[station, int_start:int_end]))
+        passes.append((station, rise, mins, max(rise, middle - 1), min(mins, middle + 1)))
+    if len(passes) == 0:
+        return allpasses
+    passstations = np.array([p[0] for p in passes])
+    maxmins = findmaxima(lambda m, b: elevation(m, b, passstations), np.array([p[3] for p in passes], dtype=float), np.array([p[4] for p in passes], dtype=float), tol)
+    for (station, rise, fall, _, _), culmination in zip(passes, maxmins):
+        allpasses[station].append((starttime_dt + timedelta(minutes=float(rise)),
+                                   starttime_dt + timedelta(minutes=float(fall)),
+                                   starttime_dt + timedelta(minutes=float(culmination))))
+    return allpasses
+
+def findstationpasses(predictors, satparamslist, starttime_dt, time_limit):
+    #Pass search for a set of ground stations at once. Each satellite gets propagated only around the times some station could
+    #possibly see it, then the elevations from every station are worked out in one go. Returns [station][satellite] passlists of
+    #(AOS, LOS, max elevation time).
+    allpasses = [[] for _ in predictors]
+    if len(satparamslist) == 0:
+        return allpasses
+    with profilestage("propagation"):
+        times = predictors[0].gettimegrid(starttime_dt, time_limit)
+        frame = getobserverframe(predictors, times)
+    for satparams in satparamslist:
+        with profilestage("propagation"):
+            elevations = sampleelevations(predictors, satparams, times, frame)
+        with profilestage("pass refinement"):
+            for stationpasses, passlist in zip(allpasses, refinepasses(predictors, satparams, starttime_dt, elevations)):
+                stationpasses.append(passlist)
+    return allpasses
+
+def findrecords(predictors, satparamslist, tleentries, starttime_dt, endtime_dt):
+    #PassRecords for every pass with an AOS between starttime_dt and endtime_dt, returned as [station][satellite] lists
+    #Passes that start near the end of the stretch finish after it, so look a full orbit past the end to catch their LOS
+    padding = max(entry.period for entry in tleentries) / 60
+    allpasses = findstationpasses(predictors, satparamslist, starttime_dt, (endtime_dt - starttime_dt).total_seconds() / 3600 + padding)
+    with profilestage("pass geometry"):
+        return [[[r for r in predictor.makerecords(satparams, passlist) if r.aos < endtime_dt] for satparams, passlist in zip(satparamslist, stationpasses)]
+                for predictor, stationpasses in zip(predictors, allpasses)]
+
+def iterpasses(predictor, satparams, tleentry, starttime_dt, endtime_dt=None):
+    #Yields (time, PassRecord) for the passes of one satellite in chronological order (time being the AOS), working through the window
+    #STREAM_CHUNK_HOURS at a time. The next chunk isn't computed until everything from the last one has been used. An endtime_dt of
+    #None never stops. After every chunk it yields (chunkend, None), as no pass from later chunks can start before that. That way a
+    #satellite that doesn't have a pass for a long time doesn't hold back the passes of the others when the streams get merged.
+    chunkstart = starttime_dt
+    while endtime_dt is None or chunkstart < endtime_dt:
+        chunkend = chunkstart + timedelta(hours=STREAM_CHUNK_HOURS)
+        if endtime_dt is not None:
+            chunkend = min(chunkend, endtime_dt)
+        try:
+            records = findrecords([predictor], [satparams], [tleentry], chunkstart, chunkend)[0][0]
+        #pyorbital raises a plain Exception when the orbit decays ("Satellite crashed") so there's nothing narrower to catch.
+        #Its messages come as printf style args, the first one is the readable part.
+        except Exception as e:
+            print(f"Stopped predicting passes for {satparams.satellite_name} after {chunkstart.astimezone():%Y-%m-%d %H:%M:%S}: {e.args[0] if len(e.args) > 0 else repr(e)}")
+            return
+        for passdata in records:
+            if endtime_dt is None or passdata.los <= endtime_dt:
+                yield passdata.aos, passdata
+        yield chunkend, None
+        chunkstart = chunkend
+
+def canreach(lat, tleentry, elevation=0):
+    #Whether the satellite could ever get above elevation (degrees) from a station at latitude lat. Its ground track never gets further
+    #from the equator than its inclination, and even from its highest point (apogee) it can only be seen that high so far around the
+    #earth, so a station further from the equator than those two together never sees it. A degree of margin covers the earth not being round.
+    inclination = float(tleentry.line2[8:16])
+    eccentricity = float("0." + tleentry.line2[26:33])
+    semimajoraxis = (EARTH_MU * (tleentry.period * 60 / (2 * math.pi)) ** 2) ** (1 / 3)
+    elevation = math.radians(max(elevation, 0))
+    reach = math.acos(min(1, EARTH_RADIUS * math.cos(elevation) / (semimajoraxis * (1 + eccentricity)))) - elevation
+    return abs(lat) <= min(inclination, 180 - inclination) + math.degrees(reach) + 1
+
+def predictslice(observers, tlelines, starttime_dt, endtime_dt, profile=False):
+    #Process pool worker for parallelfindrecords(). It gets handed the TLE lines so it never has to read the TLE file itself.
+    #Returns the records plus the propagation counts when profiling, the parent adds those to its own.
+    global profiler
+    profiler = Profiler() if profile else None
+    loadpyorbital()
+    entry = TLEEntry(*tlelines)
+    predictors = [PassPredictor(*observer) for observer in observers]
+    records = findrecords(predictors, [Orbital(entry.name, line1=entry.line1, line2=entry.line2)], [entry], starttime_dt, endtime_dt)
+    return records, profiler.calls if profile else None
+
+def parallelfindrecords(predictors, tleentries, starttime_dt, endtime_dt, workers):
+    #Same as findrecords() but split up by satellite and by time slice across a process pool. A pass belongs to the slice its AOS
+    #falls in and every slice looks past its end for the LOS, so passes straddling a slice boundary come out exactly once.
+    observers = [(p.lon, p.lat, p.alt, p.horizon, p.tol) for p in predictors]
+    window = endtime_dt - starttime_dt
+    #Aim for a few tasks per worker to keep them all busy, but no point cutting the window into slices much shorter than the orbit each one gets padded with
+    nslices = max(1, min(math.ceil(workers * 4 / len(tleentries)), int(window / timedelta(hours=6))))
+    slicebounds = [starttime_dt + window * i / nslices for i in range(nslices + 1)]
+    records = [[[] for _ in tleentries] for _ in predictors]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = []
+        for n, entry in enumerate(tleentries):
+            for i in range(nslices):
+                futures.append((n, pool.submit(predictslice, observers, (entry.name, entry.line1, entry.line2), slicebounds[i], slicebounds[i+1], profiler is not None)))
+        #Slices were submitted in time order, so adding their results in the same order keeps every list chronological
+        for n, future in futures:
+            slicerecords, calls = future.result()
+            if calls is not None:
+                profiler.addcalls(calls)
+            for stationrecords, stationslice in zip(records, slicerecords):
+                stationrecords[n] += stationslice[0]
+    return records
+
+def predictpasses(satfinds, satparamslist, starttime_dt, time_limit, workers=1):
+    #Unfiltered PassRecords for every station (SatFinder) and satellite, returned as [station][satellite] lists.
+    #Horizon limit will affect the start and finish times of the pass and the displayed total duration
+    #Because this is app isn't connected to any tracking apps, we want to display the full pass information from a 0 degree horizon.
+    predictors = [satfind.predictor for satfind in satfinds]
+    if workers <= 1 and all(satfind.passcache is None for satfind in satfinds):
+        allpasses = findstationpasses(predictors, satparamslist, starttime_dt, time_limit)
+        with profilestage("pass geometry"):
+            return [[predictor.makerecords(satparams, passlist) for satparams, passlist in zip(satparamslist, stationpasses)]
+                    for predictor, stationpasses in zip(predictors, allpasses)]
+    #Answer as much of the window as possible from the pass caches and only predict the stretches they don't cover yet
+    endtime_dt = starttime_dt + timedelta(hours=time_limit)
+    tleentries = [satfinds[0].catalog.getentry(satparams.satellite_name) for satparams in satparamslist]
+    keys = [[None] * len(satparamslist) for _ in satfinds]
+    records = [[[] for _ in satparamslist] for _ in satfinds]
+    cacheend_dt = datetime.fromtimestamp(math.ceil(endtime_dt.timestamp() / PASSCACHE_EXTEND_STEP) * PASSCACHE_EXTEND_STEP, tz=pytz.utc)
+    #Passes that are over won't be asked for again, and neither will ones from before the window when it's in the past
+    for passcache in set(satfind.passcache for satfind in satfinds if satfind.passcache is not None):
+        passcache.prune(min(time(), starttime_dt.timestamp()))
+    #Station/satellite pairs missing the same stretch get predicted together so they still share one batched run
+    gaps = {}
+    for s, satfind in enumerate(satfinds):
+        for n, entry in enumerate(tleentries):
+            if satfind.passcache is None:
+                gaps.setdefault((starttime_dt, endtime_dt), []).append((s, n))
+                continue
+            keys[s][n] = satfind.passcache.getkey(entry, satfind.ANTENNA_GPS_LONG, satfind.ANTENNA_GPS_LAT, satfind.ANTENNA_GPS_ALT, satfind.predictor.horizon, satfind.predictor.tol)
+            for gap in satfind.passcache.getgaps(keys[s][n], starttime_dt, cacheend_dt):
+                gaps.setdefault(gap, []).append((s, n))
+    for (gapstart, gapend), pairs in gaps.items():
+        stations = sorted(set(s for s, _ in pairs))
+        sats = sorted(set(n for _, n in pairs))
+        if workers > 1:
+            with profilestage("process pool"):
+                gaprecords = parallelfindrecords([predictors[s] for s in stations], [tleentries[n] for n in sats], gapstart, gapend, workers)
+        else:
+            gaprecords = findrecords([predictors[s] for s in stations], [satparamslist[n] for n in sats], [tleentries[n] for n in sats], gapstart, gapend)
+        for s, n in pairs:
+            pairrecords = gaprecords[stations.index(s)][sats.index(n)]
+            if keys[s][n] is None:
+                records[s][n] = [r for r in pairrecords if r.los <= endtime_dt]
+            else:
+                satfinds[s].passcache.addpasses(keys[s][n], gapstart, gapend, pairrecords)
+    for s, satfind in enumerate(satfinds):
+        if satfind.passcache is None:
+            continue
+        with profilestage("pass cache"):
+            records[s] = [satfind.passcache.getpasses(key, starttime_dt, endtime_dt) for key in keys[s]]
+            if satfind.passcache.autosave is True:
+                satfind.passcache.save()
+    return records
+
+def refreshpasscache(passcache, tlediff, catalog, shiftlimit=PASS_SHIFT_LIMIT):
+    #Brings the pass cache up to date after new TLE data came in (tlediff from difftlecatalogs()). Only the satellites that changed
+    #get their passes recomputed, over what's left from now on of the stretches they had cached for each location, so the work
+    #depends on how much changed rather than on how big the cached schedule is. Passes of unchanged satellites are kept as they are.
+    #Reports every pass whose AOS or LOS moved by more than shiftlimit seconds, and passes that appeared or went away.
+    changed = {old.name: new for old, new in tlediff["changed"]}
+    removed = set(entry.name for entry in tlediff["removed"])
+    stale = [(key, entry) for key, entry in passcache.entries.items() if entry["satname"] in changed and entry["tlehash"] != changed[entry["satname"]].tlehash]
+    for key in [key for key, entry in passcache.entries.items() if entry["satname"] in removed]:
+        del passcache.entries[key]
+        passcache.changed = True
+    if len(stale) == 0:
+        return
+    loadpyorbital()
+    now = time()
+    moved = 0
+    recomputed = set()
+    for key, entry in stale:
+        passcache.entries.pop(key, None)
+        passcache.changed = True
+        #Passes that are already over don't need new predictions
+        covered = [[max(covstart, now), covend] for covstart, covend in entry["covered"] if covend > now]
+        if len(covered) == 0:
+            continue
+        newentry = changed[entry["satname"]]
+        recomputed.add(newentry.name)
+        lon, lat, alt, horizon, precision = entry["observer"]
+        predictor = PassPredictor(lon, lat, alt, horizon, precision)
+        newkey = passcache.getkey(newentry, lon, lat, alt, horizon, precision)
+        records = []
+        for covstart, covend in covered:
+            for gapstart, gapend in passcache.getgaps(newkey, datetime.fromtimestamp(covstart, tz=pytz.utc), datetime.fromtimestamp(covend, tz=pytz.utc)):
+                found = findrecords([predictor], [catalog.getorbital(newentry.name)], [newentry], gapstart, gapend)[0][0]
+                passcache.addpasses(newkey, gapstart, gapend, found)
+                records += found
+        moved += reportshifts(entry["satname"], lat, lon, [p for p in entry["passes"] if p[0] >= now], records, shiftlimit, newentry.period)
+    if len(recomputed) > 0:
+        print(f"Updated the cached passes of {len(recomputed)} satellite(s) with new TLE data, {moved} pass(es) moved by more than {shiftlimit} seconds.")
+    if passcache.autosave is True:
+        passcache.save()
+
+def reportshifts(satname, lat, lon, oldpasses, newrecords, shiftlimit, period):
+    #Matches each old cached pass ([aos, los, ...] timestamps) with the recomputed pass closest to it (within half an orbit) and
+    #prints the ones that moved too far. Returns how many moved.
+    newaos = [r.aos.timestamp() for r in newrecords]
+    order = sorted(range(len(newrecords)), key=lambda i: newaos[i])
+    sortedaos = [newaos[i] for i in order]
+    localtime = lambda ts: datetime.fromtimestamp(ts, tz=pytz.utc).astimezone().strftime("%Y-%m-%d %H:%M:%S")
+    where = f"{lat:.4f},{lon:.4f}"
+    matched = set()
+    moved = 0
+    for oldpass in oldpasses:
+        i = bisect.bisect_left(sortedaos, oldpass[0])
+        nearby = [order[j] for j in (i - 1, i) if 0 <= j < len(order) and order[j] not in matched]
+        closest = min(nearby, key=lambda n: abs(newaos[n] - oldpass[0]), default=None)
+        if closest is None or abs(newaos[closest] - oldpass[0]) > period * 30:
+            print(f"{satname} pass at {localtime(oldpass[0])} for {where} no longer happens with the new TLE data.")
+            moved += 1
+            continue
+        matched.add(closest)
+        aosshift = newaos[closest] - oldpass[0]
+        losshift = newrecords[closest].los.timestamp() - oldpass[1]
+        if max(abs(aosshift), abs(losshift)) > shiftlimit:
+            print(f"{satname} pass at {localtime(oldpass[0])} for {where} moved: AOS {aosshift:+.1f} seconds, LOS {losshift:+.1f} seconds.")
+            moved += 1
+    for i, record in enumerate(newrecords):
+        if i not in matched:
+            print(f"New {satname} pass at {localtime(newaos[i])} for {where} with the new TLE data.")
+            moved += 1
+    return moved
+
 class SatFinder:
-    def __init__(self, ANTENNA_GPS_LONG, ANTENNA_GPS_LAT, ANTENNA_GPS_ALT, PASSLIST_FILTER_ELEVATION):
+    def __init__(self, ANTENNA_GPS_LONG, ANTENNA_GPS_LAT, ANTENNA_GPS_ALT, PASSLIST_FILTER_ELEVATION, passcache=None, precision=PASS_PRECISION):
         self.satnames = []
+        self.catalog = None
+        self.passcache = passcache
         self.ANTENNA_GPS_LONG = ANTENNA_GPS_LONG
         self.ANTENNA_GPS_LAT = ANTENNA_GPS_LAT
         self.ANTENNA_GPS_ALT = ANTENNA_GPS_ALT
         self.PASSLIST_FILTER_ELEVATION = PASSLIST_FILTER_ELEVATION
+        self.predictor = PassPredictor(ANTENNA_GPS_LONG, ANTENNA_GPS_LAT, ANTENNA_GPS_ALT, tol=precision)
         self.updatesatnames()
 
-    #Takes in a passlist, filters out passes with max elevations under the elevation_limit, and returns the list
+    #Takes in a list of PassRecords, filters out passes with max elevations under the elevation_limit, and returns the list
     #Also now filters out passes on the side we don't want
-    def filterpasses(self, satparams, passlist, elevation_limit, eastwestfilter):
-        filteredpasses = []
-        for passdata in passlist:
-            _, maxelevation = satparams.get_observer_look(passdata[2], self.ANTENNA_GPS_LONG, self.ANTENNA_GPS_LAT, self.ANTENNA_GPS_ALT)
-            if float(maxelevation) < elevation_limit:
-                continue
-            # Skip passes on the side we dont want, or dont skip anything if none.
-            longitude = round(satparams.get_lonlatalt(passdata[2])[0]) #Longitude at max elevation
-            eastwest = "W" if longitude < self.ANTENNA_GPS_LONG else "E"
-            if eastwestfilter is not None:
-                if eastwestfilter == "E" and eastwest == "W": continue
-                elif eastwestfilter == "W" and eastwest == "E": continue
-            filteredpasses.append(passdata)
-        return filteredpasses
+    def filterpasses(self, passlist, elevation_limit, eastwestfilter):
+        return [passdata for passdata in passlist if self.keeppass(passdata, elevation_limit, eastwestfilter)]
+
+    def keeppass(self, passdata, elevation_limit, eastwestfilter):
+        if passdata.maxelevation < elevation_limit:
+            return False
+        # Skip passes on the side we dont want, or dont skip anything if none.
+        if eastwestfilter is not None and passdata.eastwest != eastwestfilter:
+            return False
+        return True
 
     def printpasses(self, passlist):
-        #Our passdata is a list of passes with our satname and satparams attached to the end
         for i, passdata in enumerate(passlist):
-            #passdata[0] = AOS time
-            #passdata[1] = LOS time
-            #passdata[2] = max elevation time
-            #passdata[-2]= satname
-            #passdata[-1]= satparams
-            satname = passdata[-2]
-            satparams = passdata[-1]
-            localtz = passdata[0].astimezone()
-            nicestarttime = localtz.strftime("%Y-%m-%d %H:%M:%S")
-            starttime = localtz - datetime.now().astimezone()
-            durationtext = create_time_string((passdata[1] - passdata[0]).total_seconds())
-            starttimetext = create_time_string(starttime.total_seconds())
-            max_location = satparams.get_observer_look(passdata[2], self.ANTENNA_GPS_LONG, self.ANTENNA_GPS_LAT, self.ANTENNA_GPS_ALT)
-            longitude = round(satparams.get_lonlatalt(passdata[2])[0]) #Longitude at max elevation
-            longtext = f"{abs(longitude)}{'E' if longitude > 0 else 'W'}"
-            eastwest = "W" if longitude < self.ANTENNA_GPS_LONG else "E"
-            #Find the direction. Only way I could think of is to look at the change in azimuth angle and if its going down or up
-            #One minute ahead in time should be enough to tell for sure what direction we are going, using max elevation as reference
-            p2time = passdata[2] + timedelta(minutes=1)
-            p2location = satparams.get_observer_look(p2time, self.ANTENNA_GPS_LONG, self.ANTENNA_GPS_LAT, self.ANTENNA_GPS_ALT)
-            #More complicated than I thought, I also have to know what side of the circle I'm on
-            ns = ["North", "South"]
-            if max_location[0] > p2location[0]: #Compare their azimuths
-                di = 1
-            else:
-                di = 0
-            #And if we're on the other side of the circle its the opposite
-            if max_location[0] < 180:
-                di ^= 1
-            direction = ns[di]
-            print(f"{i+1}) {satname}\t- {nicestarttime} - {round(max_location[1])}{eastwest} degree MEL pass ({longtext} Long) heading {direction} in {starttimetext} - duration {durationtext}")
-
-    def passlist(self, satparams, satname, time_limit, starttime, eastwestfilter):
-        if satparams is None:
-            return None
+            self.printpass(i+1, passdata)
+
+    def printpass(self, num, passdata):
+        localtz = passdata.aos.astimezone()
+        nicestarttime = localtz.strftime("%Y-%m-%d %H:%M:%S")
+        starttime = localtz - datetime.now().astimezone()
+        durationtext = create_time_string((passdata.los - passdata.aos).total_seconds())
+        starttimetext = create_time_string(starttime.total_seconds())
+        longitude = round(passdata.longitude) #Longitude at max elevation
+        longtext = f"{abs(longitude)}{'E' if longitude > 0 else 'W'}"
+        print(f"{num}) {passdata.satname}\t- {nicestarttime} - {round(passdata.maxelevation)}{passdata.eastwest} degree MEL pass ({longtext} Long) heading {passdata.heading} in {starttimetext} - duration {durationtext}")
+
+    def getstarttime(self, starttime):
         if starttime == 0: # Zero means use the current date/time
-            starttime_dt = datetime.now(pytz.utc)
-        else: #Convert unix epoch time to UTC datetime object
-            starttime_dt = datetime.fromtimestamp(starttime, tz=pytz.utc)
-
-        #Horizon limit will affect the start and finish times of the pass and the displayed total duration
-        #Because this is app isn't connected to any tracking apps, we want to display the full pass information from a 0 degree horizon.
-        passlist = satparams.get_next_passes(starttime_dt, time_limit, self.ANTENNA_GPS_LONG, self.ANTENNA_GPS_LAT, self.ANTENNA_GPS_ALT) #Next 24 hours
-        #Filter out passes with max elevations below our filter limit. We filter here instead of using the horizon arg of get_next_passes because
-        #the horizon arg modifies the start and end times of the pass based on that horizon limit. We want the horizon limit AND the full pass times.
-        passlist = self.filterpasses(satparams, passlist, self.PASSLIST_FILTER_ELEVATION, eastwestfilter)
-        if len(passlist) > 0:
-            print(f"Found {len(passlist)} matching pass{'es' if len(passlist) > 1 else ''} in the next {time_limit} hours for '{satname}'.")
-        else:
-            print(f"No matching passes for {satname} found in the next {time_limit} hours using current TLE data.")
-            return None
-        return passlist
+            return datetime.now(pytz.utc)
+        #Convert unix epoch time to UTC datetime object
+        return datetime.fromtimestamp(starttime, tz=pytz.utc)
+
+    #Streaming version of predictpasses() plus reportpasses() for this station. Yields matching PassRecords for all the satellites in chronological order, computing them a
+    #chunk at a time only as they get consumed. A time_limit of 0 means keep going forever.
+    def streampasses(self, satparamslist, time_limit, starttime, eastwestfilter):
+        starttime_dt = self.getstarttime(starttime)
+        endtime_dt = starttime_dt + timedelta(hours=time_limit) if time_limit > 0 else None
+        streams = []
+        for satparams in satparamslist:
+            tleentry = self.catalog.getentry(satparams.satellite_name)
+            #A stream for a satellite that never comes up would search forever without finding anything
+            if not canreach(self.ANTENNA_GPS_LAT, tleentry, max(self.predictor.horizon, self.PASSLIST_FILTER_ELEVATION)):
+                print(f"{satparams.satellite_name} never gets above {self.PASSLIST_FILTER_ELEVATION} degrees at this location, skipping it.")
+                continue
+            streams.append(iterpasses(self.predictor, satparams, tleentry, starttime_dt, endtime_dt))
+        #Each satellite's stream is already in order so a heap merge on time puts them all in order while only holding one chunk per satellite
+        for _, passdata in heapq.merge(*streams, key=lambda item: item[0]):
+            if passdata is not None and self.keeppass(passdata, self.PASSLIST_FILTER_ELEVATION, eastwestfilter):
+                yield passdata
+
+    def reportpasses(self, allpasses, satnamelist, time_limit, eastwestfilter):
+        results = []
+        for satname, passlist in zip(satnamelist, allpasses):
+            #Filter out passes with max elevations below our filter limit. We filter here instead of using a horizon limit in the predictor
+            #because the horizon modifies the start and end times of the pass based on that horizon limit. We want the horizon limit AND the full pass times.
+            passlist = self.filterpasses(passlist, self.PASSLIST_FILTER_ELEVATION, eastwestfilter)
+            if len(passlist) > 0:
+                print(f"Found {len(passlist)} matching pass{'es' if len(passlist) > 1 else ''} in the next {time_limit} hours for '{satname}'.")
+                results.append(passlist)
+            else:
+                print(f"No matching passes for {satname} found in the next {time_limit} hours using current TLE data.")
+                results.append(None)
+        return results
 
     def getsatparams(self, satname):
         #Check if the satellite exists
         try:
-            satparams = Orbital(satname, tle_file=TLEFILEPATH)
+            satparams = self.catalog.getorbital(satname)
         except KeyError:
             closenamecheck = self.findclosestsatname(satname)
             if isinstance(closenamecheck, list):
@@ -122,30 +1099,105 @@ class SatFinder:
                 return None
             else:
                 print(f"Returning results for '{closenamecheck}' as '{satname}' wasn't found in the satellite list.")
-                satparams = Orbital(closenamecheck, tle_file=TLEFILEPATH)
+                satparams = self.catalog.getorbital(closenamecheck)
         except NotImplementedError:
             print("Pyorbital doesn't yet support calculations for geostationary satellites. There are alternative libraries that I have yet to try that may support them.")
             return None
         return satparams
 
     def findclosestsatname(self, nxsatname):
-        #Use the sequence matcher against the satnames list and return if the match is 95% or greater (needs tuning).
-        highestmatch = [None, 0]
-        for s in self.satnames:
-            possiblematch = SequenceMatcher(None, nxsatname.lower(), s.lower()).ratio()
-            #keep track of the best match so far
-            if possiblematch > highestmatch[1]: highestmatch = [s, possiblematch]
-            if possiblematch > SATNAME_MATCH_RATIO:
-                return s
-        #If we didn't get a good solid match then just return the closest thing along with None so we know its not a good match
-        return [None, highestmatch[0] if highestmatch[1] > CLOSE_ENUF_RATIO else None]
+        #Use the sequence matcher against the likeliest names in the catalog and return if the match is over SATNAME_MATCH_RATIO (needs tuning).
+        with profilestage("name matching"):
+            return self.catalog.nameindex.findclosest(nxsatname)
 
     def updatesatnames(self):
-        self.satnames = getsatnamelist()
+        self.catalog = gettlecatalog()
+        self.satnames = self.catalog.getnames()
+
+class PassWriter:
+    #Writes PassRecords out in one of the machine readable --format types instead of printing them. ndjson and csv rows go out
+    #as soon as they're written so they work with --stream. npy and parquet are column formats, so the rows get collected and
+    #written all at once by close(). npy is a numpy structured array, np.load(path, mmap_mode="r") maps it without reading it all in.
+    def __init__(self, fmt, outfile):
+        self.fmt = fmt
+        self.outfile = outfile
+        self.columns = ("station",) + PASS_FIELDS
+        self.rows = []
+        if fmt == "csv":
+            self.csvwriter = csv.writer(outfile, lineterminator="\n")
+            self.csvwriter.writerow(self.columns)
+
+    def write(self, passes, station=""):
+        rows = [(station,) + passdata.getrow() for passdata in passes]
+        if self.fmt == "ndjson":
+            self.outfile.write("".join(json.dumps(dict(zip(self.columns, row))) + "\n" for row in rows))
+            self.outfile.flush()
+        elif self.fmt == "csv":
+            self.csvwriter.writerows(rows)
+            self.outfile.flush()
+        else:
+            self.rows += rows
+
+    def getarray(self):
+        #Strings need a fixed width in a structured array, so make them as wide as the longest one
+        width = lambda i: max([1] + [len(row[i]) for row in self.rows])
+        dtype = [("station", f"U{width(0)}"), ("satname", f"U{width(1)}"), ("aos", "f8"), ("los", "f8"), ("maxeltime", "f8"),
+                 ("maxelevation", "f8"), ("azimuth", "f8"), ("longitude", "f8"), ("eastwest", "U1"), ("heading", "U5")]
+        return np.array(self.rows, dtype=dtype)
+
+    def close(self):
+        if self.fmt == "npy":
+            np.save(self.outfile, self.getarray())
+        elif self.fmt == "parquet":
+            import pyarrow, pyarrow.parquet
+            columns = list(zip(*self.rows)) if len(self.rows) > 0 else [[] for _ in self.columns]
+            types = [pyarrow.string(), pyarrow.string()] + [pyarrow.float64()] * 6 + [pyarrow.string(), pyarrow.string()]
+            table = pyarrow.table({name: pyarrow.array(column, type=t) for name, column, t in zip(self.columns, columns, types)})
+            pyarrow.parquet.write_table(table, self.outfile)
+        self.outfile.flush()
+
+class TrackWriter:
+    #Saves the sky tracks of the passes for --track, so something like a rotator controller can read upcoming tracks without
+    #working them out again. DIR/passes.npy has a row per pass with the same columns as --format npy plus trackstart and
+    #tracklength, the rows of DIR/tracks.npy that belong to it. DIR/tracks.npy is a (samples x 2) float32 array of azimuth and
+    #elevation in degrees, TRACK_STEP seconds apart starting at each pass's AOS. np.load(path, mmap_mode="r") maps either one.
+    def __init__(self, trackdir):
+        self.trackdir = trackdir
+        self.index = PassWriter("npy", None)
+        self.tracks = []
 
-def updatetle(autocheck=False):
+    def write(self, passes, station=""):
+        self.index.write(passes, station)
+        self.tracks += [passdata.track for passdata in passes]
+
+    def close(self):
+        rows = self.index.getarray()
+        index = np.zeros(len(rows), dtype=rows.dtype.descr + [("trackstart", "i8"), ("tracklength", "i4")])
+        for name in rows.dtype.names:
+            index[name] = rows[name]
+        index["tracklength"] = [len(track) for track in self.tracks]
+        index["trackstart"] = np.cumsum(index["tracklength"]) - index["tracklength"]
+        np.save(os.path.join(self.trackdir, "passes.npy"), index)
+        #Copied straight into the mapped file so the tracks we're holding never get concatenated into yet another array in memory
+        trackpath = os.path.join(self.trackdir, "tracks.npy")
+        if len(self.tracks) == 0:
+            np.save(trackpath, np.zeros((0, 2), dtype=np.float32))
+            return
+        tracks = np.lib.format.open_memmap(trackpath, mode="w+", dtype=np.float32, shape=(int(index["tracklength"].sum()), 2))
+        for start, track in zip(index["trackstart"], self.tracks):
+            tracks[start:start + len(track)] = track
+        tracks.flush()
+        del tracks
+
+def updatetle(autocheck=False, sources=("weather",)):
+    #Returns what changed between the old and new TLE data (see difftlecatalogs()), or None if nothing did
+    store = TLEStore(sources)
+    #A source added to (or taken out of) the list needs an update right away, however fresh the TLE file is. A TLE file from
+    #before the sources were remembered came from the weather group, so that only counts as a change if the list isn't just that.
+    mergedsources = store.getmergedsources()
+    sourceschanged = (mergedsources if mergedsources is not None else ["weather"]) != store.sources
     #Don't really need to update if its under 2 days old.
-    if os.access(TLEFILEPATH, os.F_OK) is True:
+    if os.access(TLEFILEPATH, os.F_OK) is True and sourceschanged is False:
         #File exists and we're not autochecking
         if autocheck is False:
             #Check age
@@ -156,19 +1208,32 @@ def updatetle(autocheck=False):
                 while yn not in "yn":
                     yn = input("Current TLE data is less than 48-hours old, are you sure you want to update? (Y/N): ").lower()
                 if yn == "n":
-                    return
+                    return None
         #File exists and we are autochecking.
         else:
            #App start autocheck, so download if its older than a week, but otherwise do nothing
            if time() - int(os.stat(TLEFILEPATH).st_mtime) < 7 * 24 * 60 * 60: # 7 days
-                return
-    print("Downloading latest weather satellite TLE data from Celestrak.org...")
-    try:
-        urlretrieve(TLEURL, TLEFILEPATH)
-    except Exception as e:
-        print(f"Failed to download weather.txt from celestrak.org. Reason: \n {str(e)}")
-    else:
-        print("Successfully downloaded a fresh weather.txt from celestrak.org")
+                return None
+    oldcatalog = TLECatalog() if os.access(TLEFILEPATH, os.F_OK) else None
+    print(f"Checking {len(sources)} TLE source(s) for new data...")
+    results = store.update()
+    for source, result in results.items():
+        if result not in ["updated", "unchanged"]:
+            print(f"Failed to download TLE data for '{source}'. Reason: \n {result}")
+    if "updated" in results.values():
+        print(f"Successfully updated {os.path.basename(TLEFILEPATH)} from {list(results.values()).count('updated')} changed source(s)")
+    #A different list of sources can change the TLE data even when none of the sources did
+    tlediff = None
+    if oldcatalog is not None and os.access(TLEFILEPATH, os.F_OK):
+        tlediff = difftlecatalogs(oldcatalog, gettlecatalog())
+    if tlediff is None or len(tlediff["changed"]) + len(tlediff["added"]) + len(tlediff["removed"]) == 0:
+        if "updated" not in results.values() and "unchanged" in results.values():
+            print("TLE data is already up to date")
+        return None
+    print(f"New TLE data for {len(tlediff['changed'])} satellite(s), {len(tlediff['unchanged'])} unchanged, {len(tlediff['added'])} added and {len(tlediff['removed'])} removed.")
+    if len(tlediff["older"]) > 0:
+        print(f"Warning: the new TLE data for {', '.join(entry.name for entry in tlediff['older'])} is older than what we had.")
+    return tlediff
 
 def create_time_string(seconds_total):
     days = int(seconds_total/86400)
@@ -193,15 +1258,38 @@ def create_time_string(seconds_total):
 
 
 def getsatnamelist():
-    satnames = []
-    with open(TLEFILEPATH, "r") as tlefile:
-        line = tlefile.readline()
-        while line != '':
-            if line[0].isdigit() is False:
-                satnames.append(line.strip())
-            line = tlefile.readline()
-    satnames.sort()
-    return satnames
+    return gettlecatalog().getnames()
+
+def loadstations(stationspath, elevationlimit):
+    #Reads the ground station file for batch mode. Each line is name,lat,long,alt,elevationlimit with altitude in meters, alt and
+    #elevationlimit can be left off (sea level and the --elevationlimit value). Lines starting with # are comments.
+    #Returns a list of (name, lat, long, alt, elevationlimit) tuples and raises ValueError with a printable message on bad input.
+    stations = []
+    try:
+        with open(stationspath, "r") as stationsfile:
+            lines = stationsfile.readlines()
+    except OSError as e:
+        raise ValueError(f"Couldn't read the stations file '{stationspath}'. Reason: \n {str(e)}")
+    for linenum, line in enumerate(lines, 1):
+        line = line.strip()
+        if len(line) == 0 or line[0] == "#": continue
+        fields = [f.strip() for f in line.split(",")]
+        if not 3 <= len(fields) <= 5:
+            raise ValueError(f"Invalid station on line {linenum} of '{stationspath}', expected name,lat,long,alt,elevationlimit.")
+        try:
+            lat = float(fields[1])
+            long = float(fields[2])
+            alt = float(fields[3]) if len(fields) > 3 and len(fields[3]) > 0 else 0
+            ellimit = float(fields[4]) if len(fields) > 4 and len(fields[4]) > 0 else elevationlimit
+        except ValueError:
+            raise ValueError(f"Invalid number for station '{fields[0]}' on line {linenum} of '{stationspath}'.")
+        #Same sanity checks main() does on --lat/--long/--alt/--elevationlimit
+        if abs(lat) > 90 or abs(long) > 180 or not -500 < alt < 9000 or not 0 <= ellimit <= 90:
+            raise ValueError(f"Station '{fields[0]}' on line {linenum} of '{stationspath}' has a latitude, longitude, altitude or elevation limit out of range.")
+        stations.append((fields[0], lat, long, alt, ellimit))
+    if len(stations) == 0:
+        raise ValueError(f"No stations found in '{stationspath}'.")
+    return stations
 
 def printsatlist():
     satnames = getsatnamelist()
@@ -219,6 +1307,179 @@ def printsatlist():
     for s in linestrs: print(s)
 
 
+class PassServer:
+    #Long running HTTP/JSON front end so dashboards don't have to pay for interpreter startup, the pyorbital import, config parsing
+    #and TLE parsing on every request. The TLE catalog, SatFinders and pass cache all stay loaded between requests.
+    #   GET /passes?lat=34.1&long=-118.3&alt=345&sats=NOAA 15,NOAA 19&timeframe=24&starttime=0&elevationlimit=0&side=E
+    #   GET /satellites
+    def __init__(self, port, passcache=None, tlesources=("weather",), shiftlimit=PASS_SHIFT_LIMIT, host="127.0.0.1"):
+        self.host = host
+        self.port = port
+        self.passcache = passcache
+        self.tlesources = tlesources
+        self.shiftlimit = shiftlimit
+        self.catalog = None
+        self.tasks = []
+        self.satfinds = {}
+        #Predictions run in a thread so the event loop can keep accepting connections, this keeps them from stepping on each other
+        self.lock = threading.Lock()
+
+    def run(self):
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            print("Shutting down.")
+        finally:
+            if self.passcache is not None:
+                self.passcache.save()
+
+    async def serve(self):
+        self.catalog = gettlecatalog()
+        server = await asyncio.start_server(self.handleconnection, self.host, self.port)
+        print(f"Serving satellite passes on http://{self.host}:{self.port}/passes")
+        #Hang on to the background tasks, asyncio only keeps weak references to them
+        self.tasks = [asyncio.create_task(self.tlereloader()), asyncio.create_task(self.cachesaver())]
+        #Shut down cleanly (and save the pass cache) when something like systemd asks us to stop
+        stop = asyncio.Event()
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+        except NotImplementedError:
+            pass #No signal handlers on Windows event loops, Ctrl+C still works
+        async with server:
+            await stop.wait()
+        print("Shutting down.")
+
+    async def tlereloader(self):
+        #Same check the CLI does at startup (download if the TLE is over a week old), just done every so often in the background
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(SERVER_TLE_CHECK_INTERVAL)
+            tlediff = await loop.run_in_executor(None, updatetle, True, self.tlesources)
+            if tlediff is not None and self.passcache is not None:
+                await loop.run_in_executor(None, self.refreshcache, tlediff)
+            with self.lock:
+                catalog = gettlecatalog()
+                if catalog is not self.catalog:
+                    print("TLE data changed on disk, reloading.")
+                    self.catalog = catalog
+                    for satfind in self.satfinds.values():
+                        satfind.updatesatnames()
+
+    async def cachesaver(self):
+        if self.passcache is None:
+            return
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(SERVER_CACHE_SAVE_INTERVAL)
+            await loop.run_in_executor(None, self.savecache)
+
+    def refreshcache(self, tlediff):
+        with self.lock:
+            refreshpasscache(self.passcache, tlediff, gettlecatalog(), self.shiftlimit)
+
+    def savecache(self):
+        with self.lock:
+            self.passcache.save()
+
+    async def handleconnection(self, reader, writer):
+        try:
+            requestline = (await reader.readline()).decode("latin-1").split()
+            #Skip the headers, we don't need any of them
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            if len(requestline) < 2 or requestline[0] != "GET":
+                status, body = 405, {"error": "Only GET requests are supported."}
+            else:
+                url = urllib.parse.urlsplit(requestline[1])
+                query = dict(urllib.parse.parse_qsl(url.query))
+                loop = asyncio.get_running_loop()
+                status, body = await loop.run_in_executor(None, self.handlerequest, url.path, query)
+        except Exception as e:
+            status, body = 500, {"error": str(e)}
+        data = json.dumps(body).encode()
+        reasons = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+        writer.write(f"HTTP/1.1 {status} {reasons[status]}\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode() + data)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    def handlerequest(self, path, query):
+        with self.lock:
+            if path == "/satellites":
+                return 200, {"satellites": gettlecatalog().getnames()}
+            if path == "/passes":
+                try:
+                    return 200, self.getpasses(query)
+                except ValueError as e:
+                    return 400, {"error": str(e)}
+            return 404, {"error": f"Unknown path '{path}', try /passes or /satellites."}
+
+    def getsatfind(self, observer):
+        #SatFinders are cheap but there's no point rebuilding one per request, keep the most recently used few around.
+        #Dicts keep insertion order, so moving every hit to the end leaves the least recently used one first in line to go.
+        if observer in self.satfinds:
+            self.satfinds[observer] = self.satfinds.pop(observer)
+        else:
+            if len(self.satfinds) >= SERVER_MAX_OBSERVERS:
+                del self.satfinds[next(iter(self.satfinds))]
+            long, lat, alt = observer
+            self.satfinds[observer] = SatFinder(long, lat, alt, 0, self.passcache)
+        return self.satfinds[observer]
+
+    def getpasses(self, query):
+        #Same sanity checks main() does on the command-line arguments
+        try:
+            lat = float(query["lat"])
+            long = float(query["long"])
+            alt = float(query.get("alt", 0))
+            timeframe = int(query.get("timeframe", 24))
+            elevationlimit = float(query.get("elevationlimit", 0))
+            starttime = int(query.get("starttime", 0))
+        except KeyError as e:
+            raise ValueError(f"Missing required parameter {str(e)}.")
+        if abs(lat) > 90 or abs(long) > 180 or not -500 < alt < 9000:
+            raise ValueError("Invalid latitude, longitude or altitude.")
+        if not 0 < timeframe < 721:
+            raise ValueError("Invalid timeframe, this should be between 1 and 720 hours.")
+        if not 0 <= elevationlimit <= 90:
+            raise ValueError("Invalid elevation limit, this should be between 0 and 90 degrees.")
+        if not starttime == 0 and not 946684800 <= starttime <= 4102444800:
+            raise ValueError("Invalid starttime, only unix timestamps between year 2000-2100 are accepted.")
+        eastwestfilter = query.get("side", "").upper() or None
+        if eastwestfilter not in (None, "E", "W"):
+            raise ValueError("Invalid side, this should be E or W.")
+        satfind = self.getsatfind((long, lat, alt / 1000))
+        result = {"passes": [], "unknown": {}, "corrected": {}}
+        satparamslist = []
+        for satname in [s.strip() for s in query.get("sats", "").split(",") if len(s.strip()) > 0]:
+            try:
+                satparamslist.append(satfind.catalog.getorbital(satname))
+                continue
+            except KeyError:
+                pass
+            except NotImplementedError:
+                result["unknown"][satname] = None
+                continue
+            closenamecheck = satfind.findclosestsatname(satname)
+            if isinstance(closenamecheck, list):
+                #Unknown name, along with the closest match if there was one worth suggesting
+                result["unknown"][satname] = closenamecheck[1]
+            else:
+                result["corrected"][satname] = closenamecheck
+                satparamslist.append(satfind.catalog.getorbital(closenamecheck))
+        #The same satellite can show up more than once after name corrections, only predict it once
+        satparamslist = list({satparams.satellite_name: satparams for satparams in satparamslist}.values())
+        if len(satparamslist) == 0:
+            raise ValueError("No known satellites given in the sats parameter.")
+        allpasses = predictpasses([satfind], satparamslist, satfind.getstarttime(starttime), timeframe)[0]
+        for passlist in allpasses:
+            result["passes"] += satfind.filterpasses(passlist, elevationlimit, eastwestfilter)
+        result["passes"].sort()
+        result["passes"] = [dict(zip(PASS_FIELDS, p.getrow())) for p in result["passes"]]
+        return result
+
+
 desc = "A command line utility to print out predicted data on weather satellite passes at your location."
 parser = argparse.ArgumentParser(description=desc)
 parser.add_argument("--satlist", help="Print out list of satellites in the current TLE data on disk.", action="store_true")
@@ -236,6 +1497,22 @@ parser.add_argument("--west", help="Only show passes on the western side of the
 #Catch here is the bool() function thinks anything not 0 is true. So we have to use distuils.utils.strtobool to fix that string to a number.
 parser._option_string_actions["--east"].type = lambda tf: bool(strtobool(tf))
 parser._option_string_actions["--west"].type = lambda tf: bool(strtobool(tf))
+parser.add_argument("--stations", help="Predict passes for every ground station listed in this file instead of a single --lat/--long location. One station per line as: name,lat,long,alt,elevationlimit (alt and elevationlimit are optional).", type=str)
+parser.add_argument("-n", "--count", help="Only show the next COUNT passes. Passes are printed as soon as they are found, and a timeframe of 0 means no time limit.", type=int)
+parser.add_argument("--stream", help="Print passes as soon as they are found instead of after the whole time-frame is done. A timeframe of 0 means no time limit.", action="store_true")
+parser.add_argument("-p", "--precision", help="How precise the pass times have to be (in seconds). Bigger values are a bit faster. Default is 0.001.", type=float)
+parser.add_argument("--shiftlimit", help="When new TLE data moves passes that were already predicted (and cached), list the ones whose AOS or LOS moved by more than this many seconds. Default is 10.", type=float)
+parser.add_argument("-f", "--format", help=f"Output format for the passes, one of: {', '.join(EXPORT_FORMATS)}. Everything but text has one row per pass with unix timestamps. Default is text.", type=str)
+parser.add_argument("-o", "--output", help="Write the passes to this file instead of the screen.", type=str)
+parser.add_argument("--track", help="Also work out the azimuth/elevation track of every pass at 1 second steps (for pointing an antenna) and save it as numpy files in this directory, see the README.", type=str)
+parser.add_argument("-w", "--workers", help="Number of processes to split the pass predictions across. Default is 1 (no extra processes).", type=int)
+parser.add_argument("--server", help="Run as a local HTTP server on this port that answers pass requests with JSON, see the README.", type=int)
+parser.add_argument("--tlesources", help="Comma separated TLE sources to merge into the TLE data, either CelesTrak group names (e.g. weather,noaa,active) or full URLs. Default is weather.", type=str)
+parser.add_argument("--profile", help="After the passes, print how long each stage of the prediction took and how many times the satellite positions were calculated.", action="store_true")
+parser._option_string_actions["--profile"].type = lambda tf: bool(strtobool(tf))
+parser.add_argument("--nocache", help="Don't use or update the on-disk cache of previously predicted passes.", action="store_true")
+parser._option_string_actions["--nocache"].type = lambda tf: bool(strtobool(tf))
+parser._option_string_actions["--stream"].type = lambda tf: bool(strtobool(tf))
 parser.add_argument("Satellite_Name", help="Name of the satellite as it appears in the TLE data. Multiple satellite names can be given by separating them with a comma (,).", nargs=argparse.REMAINDER)
 #To save time, a config file can be used to set all the above arguments at once.
 
@@ -255,6 +1532,19 @@ def load_config():
         "updatetle": False,
         "east": False,
         "west": False,
+        "nocache": False,
+        "stations": None,
+        "workers": 1,
+        "precision": PASS_PRECISION,
+        "shiftlimit": PASS_SHIFT_LIMIT,
+        "format": "text",
+        "output": None,
+        "track": None,
+        "server": None,
+        "count": None,
+        "stream": False,
+        "tlesources": "weather",
+        "profile": False,
         "Satellite_Name": ""
     }
     #We are assuming the config file is in the same directory as this .py file. Running from a folder in your PATH var and loading
@@ -288,8 +1578,8 @@ def load_config():
                 val = " ".join(val)
             else:
                 continue
-        #Ignore any False values from east/west flags
-        if k in "east west":
+        #Ignore any False values from the east/west/nocache/stream/profile flags
+        if k in ["east", "west", "nocache", "stream", "profile"]:
             if val is False:
                 continue
         config[k] = val
@@ -298,27 +1588,60 @@ def load_config():
 
 
 def main():
-    global Orbital
+    global profiler
     args = load_config()
+    if args["profile"] is True:
+        profiler = Profiler()
+    tlesources = [source.strip() for source in args["tlesources"].split(",") if len(source.strip()) > 0]
+    if len(tlesources) == 0:
+        print("You must give at least one TLE source with --tlesources. See --help for more information.")
+        exit(1)
+    args["format"] = args["format"].lower()
+    if args["format"] not in EXPORT_FORMATS:
+        print(f"Invalid output format '{args['format']}'. Valid formats are: {', '.join(EXPORT_FORMATS)}.")
+        exit(1)
+    if args["format"] == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        print("The parquet format needs pyarrow installed (pip install pyarrow). The npy format doesn't need anything extra.")
+        exit(1)
+    #Passes going to the screen in a machine readable format can't have our status messages mixed in, so those go to stderr instead
+    realstdout = sys.stdout
+    if args["format"] != "text" and args["output"] is None:
+        sys.stdout = sys.stderr
     # Check if we are updating the TLE first
+    if args["shiftlimit"] < 0:
+        print("Invalid shift limit, this should be a number of seconds that's 0 or more (Default is 10).")
+        exit(1)
+    #New TLE data only means recomputing cached passes for the satellites that actually changed
     if args["updatetle"] is True:
-        updatetle()
+        tlediff = updatetle(sources=tlesources)
+        if tlediff is not None and args["nocache"] is False:
+            refreshpasscache(PassCache(), tlediff, gettlecatalog(), args["shiftlimit"])
         exit(0)
 
     #Now manually run the TLE downloader. If its not there or older than 7 days it will grab a new one
     #The --satlist arg needs the TLE file to be there, so we need to autocheck that first. 
-    updatetle(autocheck=True)
+    tlediff = updatetle(autocheck=True, sources=tlesources)
 
     if args["satlist"] is True:
         printsatlist()
         exit(0)
+
+    #Server mode takes all its other settings per request
+    if args["server"] is not None:
+        print("Loading pyorbital...")
+        loadpyorbital()
+        passcache = None if args["nocache"] is True else PassCache(autosave=False)
+        if tlediff is not None and passcache is not None:
+            refreshpasscache(passcache, tlediff, gettlecatalog(), args["shiftlimit"])
+        PassServer(args["server"], passcache, tlesources, args["shiftlimit"]).run()
+        exit(0)
     
     #Ok not in TLE update mode or satlist mode, so make sure we have what we need.
-    #The 3 bare minimum required arguments are the latitude, longitude, and sat name.
-    if args["lat"] is None:
+    #The 3 bare minimum required arguments are the latitude, longitude, and sat name. Batch mode gets its locations from the stations file instead.
+    if args["stations"] is None and args["lat"] is None:
         print("You must include your latitude (--lat) to get any pass information. See --help for more information.")
         exit(1)
-    if args["long"] is None:
+    if args["stations"] is None and args["long"] is None:
         print("You must include your longitude (--long) to get any pass information. See --help for more information.")
         exit(1)
     if len(args["Satellite_Name"]) == 0:
@@ -326,18 +1649,38 @@ def main():
         exit(1)
 
     #Basic sanity checks on all the arguments we will be using: lat long alt timeframe elevationlimit starttime Satellite_Name
-    if abs(float(args["lat"])) > 90:
-        print(f"Invalid entry for latitude: '{args['lat']}'. Valid values are between -90 and 90.")
-        exit(1)
-    if abs(float(args["long"])) > 180:
-        print(f"Invalid entry for longitude: '{args['long']}'. Valid values are between -180 and 180.")
-        exit(1)
-    #Nothing valid on earth should ever be outside those values (or even near either).
-    if not -500 < float(args["alt"]) < 9000:
-        print(f"Invalid entry for altitude: '{args['alt']}'. This should be your altitude in meters, recheck your altimeter.")
-        exit(1)
+    if args["stations"] is None:
+        if abs(float(args["lat"])) > 90:
+            print(f"Invalid entry for latitude: '{args['lat']}'. Valid values are between -90 and 90.")
+            exit(1)
+        if abs(float(args["long"])) > 180:
+            print(f"Invalid entry for longitude: '{args['long']}'. Valid values are between -180 and 180.")
+            exit(1)
+        #Nothing valid on earth should ever be outside those values (or even near either).
+        if not -500 < float(args["alt"]) < 9000:
+            print(f"Invalid entry for altitude: '{args['alt']}'. This should be your altitude in meters, recheck your altimeter.")
+            exit(1)
+    #Streaming only computes what gets printed, so it can go on as long as you like (0 means forever)
+    if args["count"] is not None:
+        if args["count"] < 1:
+            print("Invalid pass count, this should be a positive integer value.")
+            exit(1)
+        args["stream"] = True
+    if args["stream"] is True:
+        if args["format"] in ["npy", "parquet"] and args["timeframe"] == 0 and args["count"] is None:
+            print(f"The {args['format']} format is written all at once at the end, so streaming it needs a --count or a --timeframe.")
+            exit(1)
+        if args["track"] is not None and args["timeframe"] == 0 and args["count"] is None:
+            print("Tracks are saved all at once at the end, so streaming with --track needs a --count or a --timeframe.")
+            exit(1)
+        if args["timeframe"] < 0:
+            print("Invalid timeframe period, this should be a positive integer value or 0 for no limit (Default is 24).")
+            exit(1)
+        if args["stations"] is not None:
+            print("Streaming (--stream/--count) only works for a single location, not with --stations.")
+            exit(1)
     #Just because we should probably set a limit, we're limiting the timeframe to a max of 30 days (720 hours)
-    if not 0 < args["timeframe"] < 721:
+    elif not 0 < args["timeframe"] < 721:
         print("Invalid timeframe period, this should be a positive integer value (Default is 24).")
         exit(1)
     if not 0 <= args["elevationlimit"] <= 90:
@@ -349,49 +1692,125 @@ def main():
     if not args["starttime"] == 0 and not 946684800 <= args["starttime"] <= 4102444800:
         print("Invalid unix epoch timestamp given for the starttime. Only dates between year 2000-2100 are accepted. Millisecond timestamps are not supported.")
         exit(1)
+    if args["workers"] < 1:
+        print("Invalid number of workers, this should be a positive integer value (Default is 1).")
+        exit(1)
+    #Horizon crossings are found to within a minute before they get refined, so anything coarser than that doesn't mean much
+    if not 0 < args["precision"] <= 60:
+        print("Invalid precision, this should be a number of seconds between 0 and 60 (Default is 0.001).")
+        exit(1)
     # Using both --east and --west at the same time is nonsensical so complain
     if args["east"] is True and args["west"] is True:
         print("Warning: You cannot use both --east and --west at the same time. If you want passes on both sides don't include either flag. Showing both sides.")
         args["east"] = False
         args["west"] = False
+    if args["stations"] is not None:
+        try:
+            stations = loadstations(args["stations"], args["elevationlimit"])
+        except ValueError as e:
+            print(str(e))
+            exit(1)
+    else:
+        stations = [(None, args["lat"], args["long"], args["alt"], args["elevationlimit"])]
 
     #Takes a bit of time to load the library, so for help args and satlist/updatetle we don't need it so we can save time
     print("Loading pyorbital...")
-    from pyorbital.orbital import Orbital
+    with profilestage("pyorbital import"):
+        loadpyorbital()
 
     #Ok so all values except the satellite name have been validated as being somewhat sane, we can get a SatFinder obj running.
     #Convert Satellite_Name into a list, which will separate values at the comma and remove whitespace at the ends.
     satnamelist = [s.strip() for s in args["Satellite_Name"].split(",") if len(s) > 0]
-    satfind = SatFinder(args["long"], args["lat"], args["alt"]/1000, args["elevationlimit"]) #pyorbital takes altitude in km, but we like to use meters so divide by 1000.
-    satpassdata = []
-    #each item in the list is the tuple returned from get_next_passes() with the satname and satparams attached to the end
+    passcache = None if args["nocache"] is True else PassCache()
+    if tlediff is not None and passcache is not None:
+        refreshpasscache(passcache, tlediff, gettlecatalog(), args["shiftlimit"])
+    #One SatFinder per ground station, all sharing the same TLE catalog and pass cache
+    satfinds = [SatFinder(long, lat, alt/1000, ellimit, passcache, args["precision"]) for _, lat, long, alt, ellimit in stations] #pyorbital takes altitude in km, but we like to use meters so divide by 1000.
+    satfind = satfinds[0]
+    satparamslist = []
     for satname in satnamelist:
         #Now we can validate the sat name at the same time we get satparams
-        satparams = satfind.getsatparams(satname)
-        #Technically passlist() will just return none when we give it a nonetype satparams, so it will just exit one function call later
-        #But why not do it here properly.
+        with profilestage("satellite lookup"):
+            satparams = satfind.getsatparams(satname)
         if satparams is None:
             continue
-        #Using the internal satellite names in satparams instead of the supplied name incase we had to correct a typo
-        satname = satparams.satellite_name
-        eastwestfilter = None
-        if args["east"] is True:
-            eastwestfilter = "E"
-        elif args["west"] is True:
-            eastwestfilter = "W"
-        passes = satfind.passlist(satparams, satname, args["timeframe"], args["starttime"], eastwestfilter)
-        if passes is None:
-            continue
-        #Annotate the passes list with the satname and satparams
-        apasses = []
-        for p in passes:
-            apasses.append((*p, satname, satparams))
-        satpassdata += apasses
-    if len(satpassdata) == 0:
-        exit(0)
-    #Because the first index of each tuple is a datetime object, we can just do a simple sort() on our list to put it in chronological order
-    satpassdata.sort()
-    satfind.printpasses(satpassdata)
+        satparamslist.append(satparams)
+    eastwestfilter = None
+    if args["east"] is True:
+        eastwestfilter = "E"
+    elif args["west"] is True:
+        eastwestfilter = "W"
+    #Using the internal satellite names in satparams instead of the supplied name incase we had to correct a typo
+    satnames = [satparams.satellite_name for satparams in satparamslist]
+    #The passes go to the screen or the --output file, as text or through a PassWriter. Status messages stay on the screen.
+    binary = args["format"] in ["npy", "parquet"]
+    if args["output"] is not None:
+        outfile = open(args["output"], "wb") if binary else open(args["output"], "w", newline="")
+    else:
+        outfile = realstdout.buffer if binary else realstdout
+    writer = None if args["format"] == "text" else PassWriter(args["format"], outfile)
+    trackwriter = None
+    if args["track"] is not None:
+        try:
+            os.makedirs(args["track"], exist_ok=True)
+        except OSError as e:
+            print(f"Couldn't create the track directory '{args['track']}': {e}")
+            exit(1)
+        trackwriter = TrackWriter(args["track"])
+    if args["stream"] is True:
+        stream = satfind.streampasses(satparamslist, args["timeframe"], args["starttime"], eastwestfilter)
+        try:
+            for i, passdata in enumerate(itertools.islice(stream, args["count"]), 1):
+                if trackwriter is not None:
+                    with profilestage("sky tracks"):
+                        satfind.predictor.maketracks(satfind.catalog.getorbital(passdata.satname), [passdata])
+                        trackwriter.write([passdata])
+                with profilestage("filter and print"):
+                    if writer is not None:
+                        writer.write([passdata])
+                        continue
+                    with redirect_stdout(outfile):
+                        satfind.printpass(i, passdata)
+                        sys.stdout.flush()
+        except KeyboardInterrupt:
+            pass
+    else:
+        #Every satellite gets propagated once no matter how many stations we're predicting for
+        allstationpasses = predictpasses(satfinds, satparamslist, satfind.getstarttime(args["starttime"]), args["timeframe"], args["workers"])
+        for (stationname, _, _, _, _), satfind, allpasses in zip(stations, satfinds, allstationpasses):
+            with profilestage("filter and print"):
+                if stationname is not None and writer is None:
+                    print(f"\nPasses for station '{stationname}':", file=outfile)
+                allpasses = satfind.reportpasses(allpasses, satnames, args["timeframe"], eastwestfilter)
+                satpassdata = []
+                for passes in allpasses:
+                    if passes is None:
+                        continue
+                    satpassdata += passes
+                #PassRecords sort by their AOS time, so a simple sort() puts our list in chronological order
+                satpassdata.sort()
+            if trackwriter is not None:
+                with profilestage("sky tracks"):
+                    for satparams, passes in zip(satparamslist, allpasses):
+                        if passes is not None:
+                            satfind.predictor.maketracks(satparams, passes)
+                    trackwriter.write(satpassdata, stationname if stationname is not None else "")
+            with profilestage("filter and print"):
+                if writer is not None:
+                    writer.write(satpassdata, stationname if stationname is not None else "")
+                    continue
+                with redirect_stdout(outfile):
+                    satfind.printpasses(satpassdata)
+    if trackwriter is not None:
+        with profilestage("sky tracks"):
+            trackwriter.close()
+    with profilestage("filter and print"):
+        if writer is not None:
+            writer.close()
+        if args["output"] is not None:
+            outfile.close()
+    if profiler is not None:
+        profiler.report()
 
 
 if __name__ == "__main__":